@@ -1,31 +1,406 @@
-from flask import Flask, request, jsonify
-from fetch_ai_news import fetch_ai_news_with_params, format_article
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+from flask import Flask, Response, request, jsonify
+from fetch_ai_news import (AI_QUERY, TOPIC_QUERIES, fetch_ai_news_with_params,
+                           format_article, iter_ai_news, normalize_date_range, quota)
+from quota import QuotaExceeded
+from cache import HeadlineCache
+from article_store import ArticleStore, DEFAULT_PATH
+from singleflight import SingleFlight
+from prewarm import Prewarmer
 from flask_cors import CORS
 
 app = Flask(__name__)
 CORS(app)
 
+# Repeat lookups for the same range are answered from memory instead of NewsAPI.
+headline_cache = HeadlineCache(
+    ttl=int(os.getenv("AI_NEWS_CACHE_TTL", 300)),
+    max_entries=int(os.getenv("AI_NEWS_CACHE_MAX_ENTRIES", 128)),
+)
+
+# Coalesces concurrent cache misses for the same request.
+inflight = SingleFlight()
+
+# Historical ranges are served from the local article store when enabled.
+article_store = None
+if os.getenv("AI_NEWS_STORE_ENABLED", "1") == "1":
+    article_store = ArticleStore(os.getenv("AI_NEWS_STORE_PATH", DEFAULT_PATH))
+
+# Bounded pool for fetching several topics at once in /api/headlines.
+fetch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AI_NEWS_FETCH_WORKERS", 8)),
+    thread_name_prefix="headline-fetch",
+)
+
+
+def fallback_articles(date_from, date_to, num_headlines, query):
+    """
+    Best results available without spending NewsAPI quota: a stale cache
+    entry, or whatever the article store holds for the range. None if neither.
+    """
+    articles = headline_cache.get(date_from, date_to, num_headlines, query,
+                                  allow_stale=True)
+    if articles is None and article_store is not None and date_from:
+        articles = article_store.query_range(query, date_from[:10], date_to[:10],
+                                             num_headlines) or None
+    return articles
+
+
+def fetch_span(date_from, date_to, num_headlines, query):
+    """
+    Upstream fetch for one span of the article store. Spans are cached and
+    coalesced like requests, so windows that share a span (today's, within
+    the last 7 days) make a single call for it.
+    """
+    articles = headline_cache.get(date_from, date_to, num_headlines, query)
+    if articles is None:
+        # A span can equal the request it serves (a full-day timestamp range),
+        # so its key must not collide with the request's own in-flight key.
+        articles = inflight.do(("span", query, date_from, date_to, num_headlines),
+                               fetch_ai_news_with_params, date_from, date_to,
+                               num_headlines, query)
+        headline_cache.put(date_from, date_to, num_headlines, articles, query)
+    return articles
+
+
+def load_articles(date_from, date_to, num_headlines, query, ttl=None):
+    """Loads articles from the store or NewsAPI and caches them."""
+    # Once the budget runs low, prefer older results to spending the reserve.
+    if quota.is_low():
+        articles = fallback_articles(date_from, date_to, num_headlines, query)
+        if articles is not None:
+            return articles
+    try:
+        if article_store is not None:
+            articles = article_store.articles_for_range(
+                date_from, date_to, num_headlines, query, fetch_span)
+        else:
+            articles = fetch_ai_news_with_params(date_from, date_to, num_headlines,
+                                                 query)
+    except QuotaExceeded:
+        articles = fallback_articles(date_from, date_to, num_headlines, query)
+        if articles is None:
+            raise
+        return articles
+    headline_cache.put(date_from, date_to, num_headlines, articles, query, ttl)
+    return articles
+
+
+def refresh_articles(date_from, date_to, num_headlines, query, ttl):
+    """Reloads a window into the cache, sharing any identical in-flight fetch."""
+    date_from, date_to = normalize_date_range(date_from, date_to)
+    inflight.do((query, date_from, date_to, num_headlines),
+                load_articles, date_from, date_to, num_headlines, query, ttl)
+
+
+def get_cached_articles(date_from, date_to, num_headlines, query=AI_QUERY):
+    """Returns articles for the range, going upstream only on a cache miss."""
+    date_from, date_to = normalize_date_range(date_from, date_to)
+    articles = headline_cache.get(date_from, date_to, num_headlines, query)
+    if articles is None:
+        # Identical requests arriving together share one upstream fetch.
+        articles = inflight.do((query, date_from, date_to, num_headlines),
+                               load_articles, date_from, date_to, num_headlines, query)
+    return articles
+
+
+# Keeps today's, yesterday's and the last week's headlines warm in the cache.
+# With the article store, a cycle costs one NewsAPI call per query (today's
+# span, shared with the week window); yesterday and the rest of the week come
+# from the store after their first fetch of the day. At the default hourly
+# interval that is 24 calls a day of NEWSAPI_PER_DAY per prewarming process,
+# plus two when the UTC day changes. Without the store every window is
+# fetched on every cycle.
+prewarmer = Prewarmer(
+    refresh_articles,
+    queries=[AI_QUERY],
+    num_headlines=int(os.getenv("AI_NEWS_PREWARM_HEADLINES", 20)),
+    interval=int(os.getenv("AI_NEWS_PREWARM_INTERVAL", 3600)),
+    should_skip=quota.is_low,
+    calls_per_run=1 if article_store is not None else None,
+)
+# Every process that imports the app would otherwise prewarm and spend quota,
+# so under a multi-worker server it is opt-in with AI_NEWS_PREWARM=1 (set it
+# for one worker). The development server below prewarms by default.
+if os.getenv("AI_NEWS_PREWARM") == "1":
+    prewarmer.start()
+
+
+def parse_num_headlines(value, default=5):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_topics(specs):
+    """
+    Turns topic specs into (name, queries) pairs. A spec is either a topic name
+    from TOPIC_QUERIES or a dict with a name and a query or list of queries.
+    """
+    topics = []
+    for spec in specs:
+        if isinstance(spec, str):
+            if spec not in TOPIC_QUERIES:
+                raise ValueError(f"Unknown topic: {spec}")
+            topics.append((spec, [TOPIC_QUERIES[spec]]))
+            continue
+        if not isinstance(spec, dict):
+            raise ValueError(f"Topic must be a name or an object: {spec}")
+        for field in ("name", "query"):
+            if spec.get(field) is not None and not isinstance(spec[field], str):
+                raise ValueError(f"Topic {field} must be a string: {spec}")
+        if spec.get("queries") is not None and not (
+                isinstance(spec["queries"], list)
+                and all(isinstance(q, str) for q in spec["queries"])):
+            raise ValueError(f"Topic queries must be a list of strings: {spec}")
+        name = spec.get("name") or spec.get("query")
+        queries = spec.get("queries") or [spec.get("query") or TOPIC_QUERIES.get(name)]
+        if not name or not all(queries):
+            raise ValueError(f"Topic needs a name and a query: {spec}")
+        topics.append((name, queries))
+    return topics
+
+
+def timed_fetch(date_from, date_to, num_headlines, query):
+    started = time.perf_counter()
+    try:
+        articles = get_cached_articles(date_from, date_to, num_headlines, query)
+        error = None
+    except Exception as e:
+        articles, error = [], str(e)
+    return articles, error, (time.perf_counter() - started) * 1000
+
+
+def stream_upstream(date_from, date_to, num_headlines, query):
+    """
+    Yields articles for a range page by page from NewsAPI, then stores and
+    caches them. With the article store, each uncovered span of the range is
+    streamed in turn and the covered parts are read from the store.
+
+    Up to num_headlines articles are streamed in the order they arrive; the
+    remaining spans are still fetched so that the store and cache hold the
+    ranked top articles of the whole range.
+    """
+    if article_store is None or not date_from:
+        articles = []
+        for article in iter_ai_news(date_from, date_to, num_headlines, query):
+            articles.append(article)
+            yield article
+        if article_store is not None:
+            article_store.save(query, articles, ranked=True)
+        headline_cache.put(date_from, date_to, num_headlines, articles, query)
+        return
+
+    day_from, day_to = date_from[:10], date_to[:10]
+    streamed = set()
+
+    def unseen(articles):
+        for article in articles:
+            if len(streamed) >= num_headlines:
+                return
+            if article.get("url") not in streamed:
+                streamed.add(article.get("url"))
+                yield article
+
+    for span_from, span_to in article_store.uncovered_spans(query, day_from, day_to,
+                                                            num_headlines):
+        # Same span boundaries as ArticleStore.articles_for_range uses.
+        fetched = []
+        pages = iter_ai_news(span_from + "T00:00:00", span_to + "T23:59:59",
+                             num_headlines, query)
+        for article in pages:
+            fetched.append(article)
+            yield from unseen([article])
+        article_store.record_fetch(query, span_from, span_to, num_headlines, fetched)
+    articles = article_store.query_range(query, day_from, day_to, num_headlines)
+    yield from unseen(articles)
+    headline_cache.put(date_from, date_to, num_headlines, articles, query)
+
+
+def stream_articles(date_from, date_to, num_headlines, query=AI_QUERY):
+    """
+    Yields (source, article) pairs for a streamed request: from the cache or a
+    fully covered store range when possible, otherwise page by page from
+    NewsAPI, caching and storing the result once it is complete.
+    """
+    date_from, date_to = normalize_date_range(date_from, date_to)
+    articles = headline_cache.get(date_from, date_to, num_headlines, query)
+    source = "cache"
+    if articles is None and quota.is_low():
+        articles = fallback_articles(date_from, date_to, num_headlines, query)
+        source = "fallback"
+    if articles is None and article_store is not None and date_from and not \
+            article_store.uncovered_spans(query, date_from[:10], date_to[:10], num_headlines):
+        articles = article_store.query_range(query, date_from[:10], date_to[:10], num_headlines)
+        headline_cache.put(date_from, date_to, num_headlines, articles, query)
+        source = "store"
+    if articles is not None:
+        for article in articles:
+            yield source, article
+        return
+
+    # Shares the key of get_cached_articles, so streamed and plain requests
+    # for the same range wait on one upstream fetch.
+    for article in inflight.stream((query, date_from, date_to, num_headlines),
+                                   stream_upstream, date_from, date_to, num_headlines, query):
+        yield "upstream", article
+
+
+def headline_frames(articles, stream_format):
+    """Encodes streamed headlines as NDJSON lines or server-sent events."""
+    def encode(event, payload):
+        data = json.dumps(payload)
+        if stream_format == "sse":
+            return f"event: {event}\ndata: {data}\n\n"
+        return data + "\n"
+
+    started = time.perf_counter()
+    first_ms = None
+    count = 0
+    source = None
+    try:
+        for source, article in articles:
+            if first_ms is None:
+                first_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield encode("headline", {"index": count, "headline": format_article(article)})
+            count += 1
+    except Exception as e:
+        yield encode("error", {"error": str(e)})
+    yield encode("done", {
+        "done": True,
+        "count": count,
+        "source": source,
+        "first_headline_ms": first_ms,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
 
 @app.route("/api/ai-news", methods=["GET"])
 def get_ai_news():
     # Get query parameters for the date range and number of headlines
     date_from = request.args.get("date_from")
     date_to = request.args.get("date_to")
-    num_headlines = request.args.get("numHeadlines", 5)
-    try:
-        num_headlines = int(num_headlines)
-    except ValueError:
-        num_headlines = 5
+    num_headlines = parse_num_headlines(request.args.get("numHeadlines", 5))
+
+    # Optional streaming: ?stream=ndjson or ?stream=sse (or an SSE Accept header).
+    stream_format = request.args.get("stream")
+    if not stream_format and request.accept_mimetypes.best == "text/event-stream":
+        stream_format = "sse"
+    if stream_format in ("ndjson", "sse"):
+        try:
+            normalize_date_range(date_from, date_to)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+        frames = headline_frames(
+            stream_articles(date_from, date_to, num_headlines), stream_format)
+        return Response(frames, mimetype=mimetype, headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
 
     try:
-        articles = fetch_ai_news_with_params(date_from, date_to, num_headlines)
+        articles = get_cached_articles(date_from, date_to, num_headlines)
         # Format each article using your format_article function.
         headlines = [format_article(article) for article in articles]
         return jsonify({"headlines": headlines})
+    except QuotaExceeded as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "60"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/headlines", methods=["GET", "POST"])
+def get_headlines():
+    """
+    Fetches several topics concurrently and returns them in one payload.
+
+    GET takes repeated `topic` names and/or ad-hoc `q` queries; POST takes a
+    JSON body with a `topics` list. Both accept date_from, date_to and
+    numHeadlines, applied to every topic.
+    """
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        if body is None:
+            body = {}
+        if not isinstance(body, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        specs = body.get("topics") or []
+        if not isinstance(specs, list):
+            return jsonify({"error": "topics must be a list"}), 400
+    else:
+        body = request.args
+        specs = request.args.getlist("topic") + [
+            {"name": q, "query": q} for q in request.args.getlist("q")]
+    date_from = body.get("date_from")
+    date_to = body.get("date_to")
+    num_headlines = parse_num_headlines(body.get("numHeadlines", 5))
+
+    try:
+        topics = parse_topics(specs or list(TOPIC_QUERIES))
+        normalize_date_range(date_from, date_to)
+    except (ValueError, AttributeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    started = time.perf_counter()
+    futures = [
+        [fetch_pool.submit(timed_fetch, date_from, date_to, num_headlines, query)
+         for query in queries]
+        for _, queries in topics
+    ]
+    results = []
+    for (name, queries), topic_futures in zip(topics, futures):
+        variants, errors, elapsed = [], [], 0.0
+        for future in topic_futures:
+            variant_articles, error, variant_elapsed = future.result()
+            variants.append(variant_articles)
+            elapsed = max(elapsed, variant_elapsed)
+            if error:
+                errors.append(error)
+        # Interleave query variants so each contributes, dropping repeated URLs.
+        articles, seen = [], set()
+        for article in chain.from_iterable(zip_longest(*variants)):
+            if article is not None and article.get("url") not in seen:
+                seen.add(article.get("url"))
+                articles.append(article)
+        headlines = [format_article(article) for article in articles[:num_headlines]]
+        result = {
+            "topic": name,
+            "queries": queries,
+            "headlines": headlines,
+            "elapsed_ms": round(elapsed, 1),
+        }
+        if errors:
+            result["errors"] = errors
+        results.append(result)
+
+    return jsonify({
+        "topics": results,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    return jsonify({
+        "cache": headline_cache.stats(),
+        "singleflight": inflight.stats(),
+        "quota": quota.usage(),
+        "prewarm": prewarmer.stats(),
+    })
+
+
+@app.route("/api/quota", methods=["GET"])
+def get_quota():
+    return jsonify(quota.usage())
+
+
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5001)
-    app.run(host='0.0.0.0', port=5001)
+    if os.getenv("AI_NEWS_PREWARM", "1") == "1":
+        prewarmer.start()
+    app.run(host='0.0.0.0', port=int(os.getenv("AI_NEWS_PORT", 5001)))
@@ -0,0 +1,320 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    query TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    published_at TEXT,
+    relevance REAL NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (query, url)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_published
+    ON articles (query, published_at);
+CREATE INDEX IF NOT EXISTS idx_articles_relevance
+    ON articles (query, relevance DESC, published_at DESC);
+-- A covered day has been fetched from NewsAPI in full and will not change, so
+-- any range of covered days is answered locally. Only rows with a NULL depth
+-- count; per-day depths were recorded by earlier versions and are ignored.
+CREATE TABLE IF NOT EXISTS covered_days (
+    query TEXT NOT NULL,
+    day TEXT NOT NULL,
+    depth INTEGER,
+    PRIMARY KEY (query, day)
+);
+-- A covered span was fetched as one request for its top `depth` articles.
+-- Those are not the top articles of each day in it, so a span only answers
+-- requests for exactly that span, or unions of such spans.
+CREATE TABLE IF NOT EXISTS covered_spans (
+    query TEXT NOT NULL,
+    day_from TEXT NOT NULL,
+    day_to TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (query, day_from, day_to)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    query TEXT PRIMARY KEY,
+    high_water TEXT NOT NULL
+);
+"""
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "articles.db")
+
+# NewsAPI caps a single page at 100 results.
+SYNC_PAGE_SIZE = 100
+
+
+def query_terms(query):
+    """Splits a NewsAPI query into its quoted phrases and bare words."""
+    phrases = re.findall(r'"([^"]+)"', query)
+    words = re.findall(r"[\w-]+", re.sub(r'"[^"]+"', " ", query))
+    terms = phrases + [w for w in words if w not in ("AND", "OR", "NOT")]
+    return [re.compile(r"\b%s\b" % re.escape(t), re.IGNORECASE) for t in terms]
+
+
+def relevance_score(article, terms, rank=None, page_size=None):
+    """
+    Scores an article against the query terms: title hits count three times as
+    much as description hits, plus a bonus for NewsAPI's own relevancy rank.
+    """
+    title = article.get("title") or ""
+    description = article.get("description") or ""
+    score = sum(3 * len(t.findall(title)) + len(t.findall(description))
+                for t in terms)
+    if rank is not None and page_size:
+        score += 1 - rank / page_size
+    return float(score)
+
+
+def day_range(day_from, day_to):
+    current = date.fromisoformat(day_from)
+    end = date.fromisoformat(day_to)
+    while current <= end:
+        yield current.isoformat()
+        current += timedelta(days=1)
+
+
+def contiguous_spans(days):
+    """Groups sorted ISO days into (first, last) runs of consecutive days."""
+    spans = []
+    for day in days:
+        if spans and date.fromisoformat(day) - date.fromisoformat(spans[-1][1]) == timedelta(days=1):
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return [tuple(span) for span in spans]
+
+
+def utc_today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class ArticleStore:
+    """
+    SQLite store of NewsAPI articles so historical date ranges are answered
+    with local index scans and only uncovered days go upstream.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, query, articles, ranked=False):
+        """Upserts articles; ranked means they came back in relevancy order."""
+        terms = query_terms(query)
+        rows = []
+        for rank, article in enumerate(articles):
+            if not article.get("url"):
+                continue
+            score = relevance_score(article, terms,
+                                    rank if ranked else None, len(articles))
+            rows.append((query, article["url"], article.get("title"),
+                         article.get("publishedAt"), score, json.dumps(article)))
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO articles (query, url, title, published_at, relevance, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (query, url) DO UPDATE SET "
+                "title = excluded.title, published_at = excluded.published_at, "
+                "relevance = MAX(relevance, excluded.relevance), payload = excluded.payload",
+                rows)
+
+    def query_range(self, query, day_from, day_to, limit):
+        """Returns the most relevant stored articles published in the day range."""
+        end = (date.fromisoformat(day_to) + timedelta(days=1)).isoformat()
+        rows = self._connect().execute(
+            "SELECT payload FROM articles "
+            "WHERE query = ? AND published_at >= ? AND published_at < ? "
+            "ORDER BY relevance DESC, published_at DESC LIMIT ?",
+            (query, day_from, end, limit)).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def uncovered_days(self, query, day_from, day_to):
+        """Returns the days in the range that have not been fetched in full."""
+        covered = {
+            day for (day,) in self._connect().execute(
+                "SELECT day FROM covered_days WHERE query = ? AND day BETWEEN ? AND ? "
+                "AND depth IS NULL",
+                (query, day_from, day_to))
+        }
+        return [day for day in day_range(day_from, day_to) if day not in covered]
+
+    def uncovered_spans(self, query, day_from, day_to, depth):
+        """
+        Returns the runs of days up to today that would need an upstream fetch
+        for the top `depth` articles of the range. Days fetched in full are
+        skipped, and so are stretches made up exactly of earlier span fetches at
+        least that deep, since the top articles of a union of spans are among
+        the top articles of its parts.
+        """
+        today = utc_today()
+        # Days after today have nothing to fetch yet. Today is fetched on its
+        # own, so the finished days before it form a span that can be recorded
+        # and a today fetch can be shared between windows.
+        days = self.uncovered_days(query, day_from, day_to)
+        runs = contiguous_spans([day for day in days if day < today])
+        if today in days:
+            runs.append((today, today))
+        spans = []
+        for run_from, run_to in runs:
+            spans.extend(self._untiled(query, run_from, run_to, depth))
+        return spans
+
+    def _untiled(self, query, run_from, run_to, depth):
+        """Splits a run into the parts not covered by whole fetched spans."""
+        ends = {}
+        for span_from, span_to in self._connect().execute(
+                "SELECT day_from, day_to FROM covered_spans WHERE query = ? "
+                "AND day_from >= ? AND day_to <= ? AND depth >= ?",
+                (query, run_from, run_to, depth)):
+            ends[span_from] = max(ends.get(span_from, span_to), span_to)
+        gaps = []
+        gap_from = None
+        day = date.fromisoformat(run_from)
+        last = date.fromisoformat(run_to)
+        while day <= last:
+            end = ends.get(day.isoformat())
+            if end is None:
+                if gap_from is None:
+                    gap_from = day.isoformat()
+                day += timedelta(days=1)
+                continue
+            if gap_from is not None:
+                gaps.append((gap_from, (day - timedelta(days=1)).isoformat()))
+                gap_from = None
+            day = date.fromisoformat(end) + timedelta(days=1)
+        if gap_from is not None:
+            gaps.append((gap_from, run_to))
+        return gaps
+
+    def mark_covered(self, query, day_from, day_to):
+        """Records days fetched in full; today onwards is still changing."""
+        today = utc_today()
+        days = [day for day in day_range(day_from, day_to) if day < today]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO covered_days (query, day, depth) VALUES (?, ?, NULL) "
+                "ON CONFLICT (query, day) DO UPDATE SET depth = NULL",
+                [(query, day) for day in days])
+
+    def mark_span(self, query, day_from, day_to, depth):
+        """Records a span fetched for its top `depth` articles, once it is over."""
+        if day_to >= utc_today():
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO covered_spans (query, day_from, day_to, depth) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (query, day_from, day_to) DO UPDATE SET "
+                "depth = MAX(depth, excluded.depth)",
+                (query, day_from, day_to, depth))
+
+    def record_fetch(self, query, day_from, day_to, num_headlines, articles):
+        """Stores a span fetch and records what it covers."""
+        self.save(query, articles, ranked=True)
+        # A short page means upstream returned everything it had.
+        if len(articles) < num_headlines:
+            self.mark_covered(query, day_from, day_to)
+        else:
+            self.mark_span(query, day_from, day_to, num_headlines)
+
+    def articles_for_range(self, date_from, date_to, num_headlines, query, fetch):
+        """
+        Answers a date-range request from the store, calling
+        fetch(date_from, date_to, num_headlines, query) only for the spans of
+        days that have not been covered yet.
+        """
+        if not date_from:
+            articles = fetch(date_from, date_to, num_headlines, query)
+            self.save(query, articles, ranked=True)
+            return articles
+        day_from, day_to = date_from[:10], date_to[:10]
+        for span_from, span_to in self.uncovered_spans(query, day_from, day_to,
+                                                       num_headlines):
+            articles = fetch(span_from + "T00:00:00", span_to + "T23:59:59",
+                             num_headlines, query)
+            self.record_fetch(query, span_from, span_to, num_headlines, articles)
+        return self.query_range(query, day_from, day_to, num_headlines)
+
+    def get_high_water(self, query):
+        row = self._connect().execute(
+            "SELECT high_water FROM sync_state WHERE query = ?", (query,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, query, fetch_page, lookback_days=7, max_pages=10):
+        """
+        Pulls articles published after the last high-water mark, newest first,
+        via fetch_page(params). Returns the number of articles stored.
+        """
+        high_water = self.get_high_water(query)
+        if high_water is None:
+            start = datetime.now(timezone.utc).date() - timedelta(days=lookback_days)
+            high_water = start.isoformat() + "T00:00:00Z"
+        params = {
+            'q': query,
+            'from': high_water,
+            'sortBy': 'publishedAt',
+            'pageSize': SYNC_PAGE_SIZE,
+            'language': 'en',
+        }
+        fetched = []
+        exhausted = False
+        for page in range(1, max_pages + 1):
+            articles = fetch_page(dict(params, page=page)).get("articles", [])
+            fetched.extend(articles)
+            if len(articles) < SYNC_PAGE_SIZE:
+                exhausted = True
+                break
+        self.save(query, fetched)
+        dates = sorted(a["publishedAt"] for a in fetched if a.get("publishedAt"))
+        if exhausted:
+            self.mark_covered(query, high_water[:10], utc_today())
+        elif dates:
+            # Paging stopped early, so only days newer than the oldest fetched
+            # article are known to be complete.
+            first_day = date.fromisoformat(dates[0][:10]) + timedelta(days=1)
+            self.mark_covered(query, first_day.isoformat(), utc_today())
+        if dates:
+            high_water = dates[-1]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sync_state (query, high_water) VALUES (?, ?) "
+                "ON CONFLICT (query) DO UPDATE SET high_water = excluded.high_water",
+                (query, high_water))
+        return len(fetched)
+
+
+def main(argv):
+    """Runs the incremental sync job: python article_store.py sync [db_path]"""
+    from fetch_ai_news import TOPIC_QUERIES, fetch_everything
+
+    if not argv or argv[0] != "sync":
+        print("Usage: python article_store.py sync [db_path]")
+        return 1
+    path = argv[1] if len(argv) > 1 else os.getenv("AI_NEWS_STORE_PATH", DEFAULT_PATH)
+    store = ArticleStore(path)
+    for topic, query in TOPIC_QUERIES.items():
+        count = store.sync(query, fetch_everything)
+        print(f"{topic}: synced {count} articles "
+              f"(high-water {store.get_high_water(query)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class HeadlineCache:
+    """In-memory TTL + LRU cache for fetched NewsAPI articles.
+
+    Entries are keyed on the query and the normalized (date_from, date_to)
+    range, and remember how many headlines were requested when they were
+    filled, so a cached result for 20 headlines can also answer a request for 5.
+    """
+
+    def __init__(self, ttl=300, max_entries=128, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, date_from, date_to, num_headlines, query=None, allow_stale=False):
+        """
+        Returns up to num_headlines cached articles, or None on a miss.
+        Expired entries are kept until evicted and only served with allow_stale.
+        """
+        key = (query, date_from, date_to)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= self._clock() and not allow_stale:
+                entry = None
+            if entry is None or not self._covers(entry, num_headlines):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1][:num_headlines]
+
+    def put(self, date_from, date_to, num_headlines, articles, query=None, ttl=None):
+        """
+        Stores articles fetched for num_headlines headlines in the range, for
+        ttl seconds (the cache's default TTL if not given).
+        """
+        key = (query, date_from, date_to)
+        with self._lock:
+            now = self._clock()
+            current = self._entries.get(key)
+            # Keep a fresh, larger result set rather than shrinking it.
+            if (current is not None and current[2] > now
+                    and current[0] > num_headlines):
+                self._entries.move_to_end(key)
+                return
+            expires = now + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (num_headlines, list(articles), expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    @staticmethod
+    def _covers(entry, num_headlines):
+        requested, articles, _ = entry
+        # A short result means upstream had nothing more to give, so it also
+        # answers any larger request for the same range.
+        return requested >= num_headlines or len(articles) < requested
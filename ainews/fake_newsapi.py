@@ -0,0 +1,162 @@
+"""
+Offline stand-in for NewsAPI's /v2/everything endpoint, for benchmarks and
+local development without spending quota.
+
+    python fake_newsapi.py --port 5099 --latency-ms 250 --error-rate 0.02
+
+Point the app at it with NEWSAPI_BASE_URL=http://127.0.0.1:5099/v2/everything.
+GET /stats returns the request counts, and GET /reset clears them.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeNewsAPI:
+    """Generates deterministic NewsAPI-shaped responses with injected faults."""
+
+    def __init__(self, latency_ms=200, jitter_ms=50, error_rate=0.0,
+                 rate_limit_rate=0.0, total_results=500, article_bytes=300,
+                 max_results=None, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.total_results = total_results
+        self.article_bytes = article_bytes
+        self.max_results = max_results
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _count(self, key):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts[key] += 1
+
+    def everything(self, params):
+        """Returns (status, headers, body) for one /v2/everything request."""
+        with self._lock:
+            roll = self._random.random()
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            self._count("rate_limited")
+            return 429, {"Retry-After": "1"}, {
+                "status": "error", "code": "rateLimited", "message": "Too many requests."}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count("errors")
+            return 500, {}, {
+                "status": "error", "code": "unexpectedError", "message": "Injected failure."}
+
+        page_size = min(int(params.get("pageSize", 100)), 100)
+        page = int(params.get("page", 1))
+        start = (page - 1) * page_size
+        if self.max_results is not None and start >= self.max_results:
+            self._count("errors")
+            return 426, {}, {
+                "status": "error", "code": "maximumResultsReached",
+                "message": "Upgrade to request more results."}
+
+        self._count("ok")
+        end = min(start + page_size, self.total_results)
+        articles = [self._article(params, i) for i in range(start, end)]
+        return 200, {}, {"status": "ok", "totalResults": self.total_results,
+                         "articles": articles}
+
+    def _article(self, params, index):
+        query = params.get("q", "")
+        key = hashlib.sha1(f"{query}|{params.get('from')}|{index}".encode()).hexdigest()[:12]
+        day = params.get("from") or "2025-01-01"
+        published = datetime.fromisoformat(day[:10]) + timedelta(minutes=index * 7)
+        return {
+            "source": {"id": None, "name": "Fake Wire"},
+            "author": "Fake Author",
+            "title": f"Artificial intelligence story {index} ({key})",
+            "description": f"AI coverage for {query}",
+            "url": f"https://news.example.com/{key}",
+            "urlToImage": None,
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "content": "x" * self.article_bytes,
+        }
+
+
+def make_server(api, host="127.0.0.1", port=5099):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+            if parsed.path == "/v2/everything":
+                status, headers, body = api.everything(params)
+            elif parsed.path == "/stats":
+                status, headers, body = 200, {}, api.stats()
+            elif parsed.path == "/reset":
+                api.reset()
+                status, headers, body = 200, {}, {"status": "ok"}
+            else:
+                status, headers, body = 404, {}, {"status": "error", "code": "notFound"}
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fraction of requests answered with a 429")
+    parser.add_argument("--total-results", type=int, default=500)
+    parser.add_argument("--article-bytes", type=int, default=300,
+                        help="size of each article's content field")
+    parser.add_argument("--max-results", type=int, default=None,
+                        help="answer pages past this many results with a 426")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    api = FakeNewsAPI(args.latency_ms, args.jitter_ms, args.error_rate,
+                      args.rate_limit_rate, args.total_results, args.article_bytes,
+                      args.max_results, args.seed)
+    server = make_server(api, args.host, args.port)
+    print(f"Fake NewsAPI listening on http://{args.host}:{args.port}/v2/everything")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from http_client import HttpClient
+from quota import DEFAULT_PATH as QUOTA_PATH, QuotaGovernor
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,7 +15,50 @@ if not API_KEY:
     raise ValueError(
         "No API key found. Please set NEWSAPI_KEY in your .env file.")
 
-BASE_URL = "https://newsapi.org/v2/everything"
+BASE_URL = os.getenv("NEWSAPI_BASE_URL", "https://newsapi.org/v2/everything")
+
+AI_QUERY = '"artificial intelligence" OR AI'
+
+# NewsAPI search queries behind each newsletter topic in the React app.
+TOPIC_QUERIES = {
+    "AI Headlines": AI_QUERY,
+    "Senior Housing News": '"senior housing" OR "senior living" OR "assisted living"',
+    "For-Sale Listings": '"homes for sale" OR "real estate listings"',
+}
+
+# NewsAPI returns at most 100 articles per page.
+MAX_PAGE_SIZE = 100
+MAX_PAGES = int(os.getenv("NEWSAPI_MAX_PAGES", 10))
+PAGE_WORKERS = int(os.getenv("NEWSAPI_PAGE_WORKERS", 4))
+
+# Shared pooled client so the Flask app and the CLI reuse connections.
+client = HttpClient(
+    connect_timeout=float(os.getenv("NEWSAPI_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.getenv("NEWSAPI_READ_TIMEOUT", 10)),
+    max_retries=int(os.getenv("NEWSAPI_MAX_RETRIES", 3)),
+    pool_size=int(os.getenv("NEWSAPI_POOL_SIZE", 10)),
+)
+# Every upstream call spends from a budget shared by all app workers.
+quota = QuotaGovernor(
+    os.getenv("NEWSAPI_QUOTA_PATH", QUOTA_PATH),
+    per_minute=int(os.getenv("NEWSAPI_PER_MINUTE", 30)),
+    per_day=int(os.getenv("NEWSAPI_PER_DAY", 100)),
+    reserve=int(os.getenv("NEWSAPI_QUOTA_RESERVE", 10)),
+)
+page_pool = ThreadPoolExecutor(max_workers=PAGE_WORKERS,
+                               thread_name_prefix="newsapi-page")
+
+
+def fetch_everything(params):
+    """Calls the NewsAPI /everything endpoint and returns the decoded response."""
+    # Each attempt, retries included, is a real NewsAPI request.
+    response = client.get(BASE_URL, params=dict(params, apiKey=API_KEY),
+                          before_attempt=quota.check)
+    response.raise_for_status()
+    data = response.json()
+    if data.get("status") != "ok":
+        raise Exception("API returned an error: " + str(data))
+    return data
 
 
 def fetch_ai_news():
@@ -22,14 +68,8 @@ def fetch_ai_news():
         'sortBy': 'relevancy',                    # Sort by relevance
         'pageSize': 5,                            # Top 5 articles
         'language': 'en',                         # English articles only
-        'apiKey': API_KEY
     }
-    response = requests.get(BASE_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    if data.get("status") != "ok":
-        raise Exception("API returned an error: " + str(data))
-    return data.get("articles", [])
+    return fetch_everything(params).get("articles", [])
 
 
 def format_article(article):
@@ -55,34 +95,96 @@ if __name__ == "__main__":
     main()
 
 
-def fetch_ai_news_with_params(date_from: str, date_to: str, num_headlines: int):
+def normalize_date_range(date_from, date_to):
+    """
+    Normalizes a requested date range so equivalent requests compare equal.
+    Blank values become None, and a missing end date defaults to one day
+    after the start date.
+    """
+    date_from = (date_from or "").strip() or None
+    date_to = (date_to or "").strip() or None
+    if date_from and not date_to:
+        date_obj = datetime.fromisoformat(date_from)
+        date_to = (date_obj + timedelta(days=1)).isoformat().split("T")[0]
+    return date_from, date_to
+
+
+def fetch_ai_news_with_params(date_from: str, date_to: str, num_headlines: int,
+                              query: str = AI_QUERY):
     """
     Fetches AI news filtered to a given date range (using 'from' and 'to' parameters)
-    and returns up to num_headlines articles.
+    and returns up to num_headlines articles. Pass query to search another topic.
     """
+    return list(iter_ai_news(date_from, date_to, num_headlines, query))
+
+
+def iter_ai_news(date_from, date_to, num_headlines, query=AI_QUERY):
+    """Like fetch_ai_news_with_params, but yields articles as pages arrive."""
     params = {
-        'q': '"artificial intelligence" OR AI',
+        'q': query,
         'sortBy': 'relevancy',
-        'pageSize': num_headlines,
         'language': 'en',
-        'apiKey': API_KEY
     }
+    date_from, date_to = normalize_date_range(date_from, date_to)
     if date_from:
         params['from'] = date_from
     if date_to:
         params['to'] = date_to
-    else:
-        # If no end date provided, default to one day after the start date.
-        if date_from:
-            from datetime import timedelta
-            date_obj = datetime.fromisoformat(date_from)
-            to_date_obj = date_obj + timedelta(days=1)
-            to_date = to_date_obj.isoformat().split("T")[0]
-            params['to'] = to_date
-
-    response = requests.get(BASE_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    if data.get("status") != "ok":
-        raise Exception("API returned an error: " + str(data))
-    return data.get("articles", [])
+
+    return iter_articles(params, num_headlines)
+
+
+def is_live_article(article):
+    """Filters out NewsAPI's placeholders for articles that were taken down."""
+    return article.get("title") not in (None, "[Removed]") and bool(article.get("url"))
+
+
+def iter_articles(params, limit, predicate=is_live_article, max_workers=None):
+    """
+    Streams up to limit articles matching predicate, in NewsAPI order.
+
+    Requests over MAX_PAGE_SIZE are spread across several `page` requests, up
+    to max_workers of them in flight at once. Articles are yielded as soon as
+    their page and every earlier page have arrived, and no further pages are
+    requested once enough articles have passed the predicate.
+    """
+    max_workers = max_workers or PAGE_WORKERS
+    page_size = min(limit, MAX_PAGE_SIZE)
+    if page_size <= 0:
+        return
+    last_page = MAX_PAGES
+    pending = {}
+    next_page = 1
+    yielded = 0
+    try:
+        while yielded < limit and next_page <= last_page:
+            # Keep the window full with the pages still needed for the limit.
+            wanted = next_page + max(1, -(-(limit - yielded) // page_size))
+            while (len(pending) < max_workers and next_page + len(pending) < wanted
+                   and next_page + len(pending) <= last_page):
+                page = next_page + len(pending)
+                pending[page] = page_pool.submit(
+                    fetch_everything, dict(params, pageSize=page_size, page=page))
+            try:
+                data = pending.pop(next_page).result()
+            except requests.HTTPError as e:
+                # Plans with a result cap answer later pages with 426.
+                if e.response is not None and e.response.status_code == 426:
+                    break
+                raise
+            articles = data.get("articles", [])
+            total = data.get("totalResults")
+            if total is not None:
+                last_page = min(last_page, -(-total // page_size))
+            if len(articles) < page_size:
+                last_page = next_page
+            for article in articles:
+                if predicate is None or predicate(article):
+                    yield article
+                    yielded += 1
+                    if yielded >= limit:
+                        break
+            next_page += 1
+    finally:
+        for future in pending.values():
+            future.cancel()
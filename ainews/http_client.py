@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient server errors.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """Shared HTTP client with keep-alive pooling, timeouts and retries.
+
+    Retries use exponential backoff with full jitter on 429/5xx responses and
+    connection errors, and honor the server's Retry-After header when present.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, max_retries=3,
+                 backoff_base=0.5, backoff_max=30, pool_size=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # requests.Session is not guaranteed thread-safe, so each thread gets
+        # its own session; connections are still reused across its requests.
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                  pool_maxsize=self.pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, params=None, before_attempt=None, **kwargs):
+        """
+        Sends a GET request, retrying transient failures. before_attempt is
+        called before every attempt, retries included; an exception it raises
+        stops the request.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            if before_attempt is not None:
+                before_attempt()
+            try:
+                response = self.session.get(url, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if (response.status_code not in RETRY_STATUSES
+                        or attempt >= self.max_retries):
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max,
+                                     self.backoff_base * 2 ** attempt))
+
+    def _retry_after(self, response):
+        """Parses Retry-After as either delta-seconds or an HTTP date."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        return min(self.backoff_max, max(0.0, delay))
+
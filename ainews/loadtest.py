@@ -0,0 +1,216 @@
+"""
+Load test for /api/ai-news against the offline fake NewsAPI.
+
+    python loadtest.py --concurrency 1 8 32 --duration 10
+
+Each concurrency level starts a fresh app process (cold cache and article
+store) pointed at an in-process fake NewsAPI, drives it for the given time and
+reports throughput, latency percentiles and upstream call counts. Results are
+written to bench_results/ as JSON; pass --compare with an earlier file to print
+the change against it.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+
+from fake_newsapi import FakeNewsAPI, make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index], 2)
+
+
+def wait_for(url, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"App did not start at {url}")
+
+
+def start_app(port, upstream_url, store_dir, extra_env):
+    env = dict(os.environ,
+               NEWSAPI_KEY="loadtest",
+               NEWSAPI_BASE_URL=upstream_url,
+               AI_NEWS_PORT=str(port),
+               AI_NEWS_STORE_PATH=os.path.join(store_dir, "articles.db"),
+               NEWSAPI_QUOTA_PATH=os.path.join(store_dir, "quota.db"),
+               NEWSAPI_PER_MINUTE="1000000",
+               NEWSAPI_PER_DAY="1000000",
+               AI_NEWS_PREWARM="0",
+               **extra_env)
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for(f"http://127.0.0.1:{port}/api/metrics")
+    return process
+
+
+def request_mix(distinct_ranges, num_headlines):
+    """Builds the parameter sets a run samples from, newest ranges first."""
+    today = date.today()
+    mix = []
+    for offset in range(distinct_ranges):
+        day = today - timedelta(days=offset)
+        for num in num_headlines:
+            mix.append({"date_from": day.isoformat(), "numHeadlines": num})
+    return mix
+
+
+def drive(base_url, mix, concurrency, duration, seed):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            params = rng.choice(mix)
+            started = time.perf_counter()
+            try:
+                response = session.get(base_url, params=params, timeout=60)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_level(args, api, upstream_url, concurrency):
+    api.reset()
+    with tempfile.TemporaryDirectory() as store_dir:
+        extra_env = {} if args.store else {"AI_NEWS_STORE_ENABLED": "0"}
+        process = start_app(args.app_port, upstream_url, store_dir, extra_env)
+        try:
+            base_url = f"http://127.0.0.1:{args.app_port}/api/ai-news"
+            mix = request_mix(args.distinct_ranges, args.num_headlines)
+            latencies, errors, wall = drive(base_url, mix, concurrency,
+                                            args.duration, args.seed)
+            metrics = requests.get(f"http://127.0.0.1:{args.app_port}/api/metrics").json()
+        finally:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    total = len(latencies) + len(errors)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "throughput_rps": round(total / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(latencies[-1], 2) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        },
+        "upstream": api.stats(),
+        "app_metrics": metrics,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    print(f"\nCompared with {previous_path}:")
+    for level in current["levels"]:
+        before = previous.get(level["concurrency"])
+        if not before:
+            continue
+        print(f"  c={level['concurrency']:>3}  "
+              f"rps {before['throughput_rps']} -> {level['throughput_rps']}  "
+              f"p95 {before['latency_ms']['p95']} -> {level['latency_ms']['p95']} ms  "
+              f"upstream {before['upstream']['requests']} -> {level['upstream']['requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/ai-news offline.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--distinct-ranges", type=int, default=7,
+                        help="how many different days requests are spread over")
+    parser.add_argument("--num-headlines", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--article-bytes", type=int, default=300)
+    parser.add_argument("--no-store", dest="store", action="store_false",
+                        help="disable the SQLite article store in the app")
+    parser.add_argument("--app-port", type=int, default=5098)
+    parser.add_argument("--upstream-port", type=int, default=5099)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="result file (default: bench_results/)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    api = FakeNewsAPI(args.latency_ms, args.jitter_ms, args.error_rate,
+                      args.rate_limit_rate, article_bytes=args.article_bytes, seed=args.seed)
+    server = make_server(api, port=args.upstream_port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}/v2/everything"
+
+    result = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": vars(args),
+        "levels": [],
+    }
+    try:
+        for concurrency in args.concurrency:
+            level = run_level(args, api, upstream_url, concurrency)
+            result["levels"].append(level)
+            latency = level["latency_ms"]
+            print(f"c={concurrency:>3}  {level['throughput_rps']:>8} req/s  "
+                  f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+                  f"errors {level['errors']}  upstream calls {level['upstream']['requests']}")
+    finally:
+        server.shutdown()
+
+    output = args.output or os.path.join(
+        HERE, "bench_results", f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def common_windows(today=None):
+    """
+    The date ranges editors ask for most: today, yesterday and the last 7
+    days, as (date_from, date_to) pairs in the form the React app sends them.
+    The app uses UTC dates, so these do too.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=6)
+    return [
+        (today.isoformat(), today.isoformat()),
+        (yesterday.isoformat(), yesterday.isoformat()),
+        (week_start.isoformat(), today.isoformat()),
+    ]
+
+
+class Prewarmer:
+    """
+    Background thread that refreshes the common headline windows on a fixed
+    cadence, so they are already cached when the first editor asks.
+
+    refresh(date_from, date_to, num_headlines, query, ttl) must load the
+    window and store it in the cache for ttl seconds; entries are given a TTL
+    a little longer than the cadence so each refresh lands before expiry.
+    calls_per_run is the NewsAPI calls one run costs per query, for the
+    budget estimate in stats(); by default one per window.
+    """
+
+    def __init__(self, refresh, queries, num_headlines=20, interval=900,
+                 should_skip=None, windows=common_windows, calls_per_run=None):
+        self.refresh = refresh
+        self.queries = queries
+        self.num_headlines = num_headlines
+        self.interval = interval
+        self.should_skip = should_skip
+        self.windows = windows
+        self.calls_per_run = calls_per_run
+        self._stop = threading.Event()
+        self._thread = None
+        self.runs = 0
+        self.refreshed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_run = None
+
+    def calls_per_day(self):
+        """Estimated upstream calls a day at this cadence."""
+        per_run = self.calls_per_run
+        if per_run is None:
+            per_run = len(self.windows())
+        return len(self.queries) * per_run * 86400 // self.interval
+
+    def start(self):
+        if self._thread is None:
+            logger.info("Prewarming %d windows for %d queries every %ds "
+                        "(about %d NewsAPI calls a day)", len(self.windows()),
+                        len(self.queries), self.interval, self.calls_per_day())
+            self._thread = threading.Thread(target=self._loop, name="prewarmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        ttl = self.interval * 1.5
+        for query in self.queries:
+            for date_from, date_to in self.windows():
+                if self._stop.is_set():
+                    return
+                # Never spend the quota reserve on speculative refreshes.
+                if self.should_skip is not None and self.should_skip():
+                    self.skipped += 1
+                    continue
+                try:
+                    self.refresh(date_from, date_to, self.num_headlines, query, ttl)
+                    self.refreshed += 1
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Prewarming %s..%s failed", date_from, date_to)
+        self.runs += 1
+        self.last_run = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval": self.interval,
+            "estimated_calls_per_day": self.calls_per_day(),
+            "runs": self.runs,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minute_bucket (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_usage (
+    day TEXT PRIMARY KEY,
+    calls INTEGER NOT NULL DEFAULT 0,
+    denied INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quota.db")
+
+
+class QuotaExceeded(Exception):
+    """Raised when an upstream call would exceed the NewsAPI budget."""
+
+
+class QuotaGovernor:
+    """
+    NewsAPI call budget shared by every Flask worker through one SQLite file.
+
+    The per-minute budget is a token bucket refilled continuously; the per-day
+    budget counts calls per UTC day, matching how NewsAPI resets its quota.
+    """
+
+    def __init__(self, path, per_minute=30, per_day=100, reserve=10):
+        self.path = path
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.reserve = reserve
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def _minute_tokens(self, conn, now):
+        row = conn.execute("SELECT tokens, updated FROM minute_bucket WHERE id = 1").fetchone()
+        if row is None:
+            return float(self.per_minute)
+        tokens, updated = row
+        refill = (now - updated) * self.per_minute / 60.0
+        return min(float(self.per_minute), tokens + refill)
+
+    def acquire(self):
+        """Takes one call from both budgets; returns False if either is spent."""
+        conn = self._connect()
+        now = time.time()
+        today = self._today()
+        # BEGIN IMMEDIATE takes the write lock up front so workers serialize here.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens = self._minute_tokens(conn, now)
+            row = conn.execute("SELECT calls FROM daily_usage WHERE day = ?", (today,)).fetchone()
+            calls = row[0] if row else 0
+            allowed = tokens >= 1 and calls < self.per_day
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO minute_bucket (id, tokens, updated) VALUES (1, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (tokens, now))
+            conn.execute(
+                "INSERT INTO daily_usage (day, calls, denied) VALUES (?, ?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET calls = calls + excluded.calls, "
+                "denied = denied + excluded.denied",
+                (today, int(allowed), int(not allowed)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def check(self):
+        """Like acquire, but raises QuotaExceeded instead of returning False."""
+        if not self.acquire():
+            raise QuotaExceeded("NewsAPI request budget exhausted; try again later.")
+
+    def usage(self):
+        conn = self._connect()
+        row = conn.execute("SELECT calls, denied FROM daily_usage WHERE day = ?",
+                           (self._today(),)).fetchone()
+        calls, denied = row if row else (0, 0)
+        minute_tokens = self._minute_tokens(conn, time.time())
+        return {
+            "day": self._today(),
+            "calls_today": calls,
+            "denied_today": denied,
+            "per_day": self.per_day,
+            "remaining_today": max(0, self.per_day - calls),
+            "per_minute": self.per_minute,
+            "remaining_this_minute": int(minute_tokens),
+            "reserve": self.reserve,
+            "low": self.is_low(),
+        }
+
+    def is_low(self):
+        """True once the daily budget is down to the reserve or the minute is spent."""
+        conn = self._connect()
+        row = conn.execute("SELECT calls FROM daily_usage WHERE day = ?",
+                           (self._today(),)).fetchone()
+        calls = row[0] if row else 0
+        return (self.per_day - calls <= self.reserve
+                or self._minute_tokens(conn, time.time()) < 1)
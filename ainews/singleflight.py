@@ -0,0 +1,106 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Set when a streaming leader stopped before finishing, so waiters
+        # should run the call again rather than share a partial result.
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """Returns (call, leader) for the key, registering a new call if needed."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        return call, leader
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+        call.done.set()
+
+    def _wait(self, call):
+        """Waits for a leader; returns False if it abandoned the call."""
+        call.done.wait()
+        if call.abandoned:
+            return False
+        if call.error is not None:
+            raise call.error
+        return True
+
+    def do(self, key, fn, *args, **kwargs):
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            if self._wait(call):
+                return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def stream(self, key, fn, *args, **kwargs):
+        """
+        Like do, for a function returning an iterable: the leader yields items
+        as fn produces them, and callers waiting on it get the complete list.
+        Waiters on a plain do call for the same key also receive the list.
+        """
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            if self._wait(call):
+                yield from call.result
+                return
+
+        items = []
+        try:
+            for item in fn(*args, **kwargs):
+                items.append(item)
+                yield item
+            call.result = items
+        except GeneratorExit:
+            # The consumer went away mid-stream; let a waiter take over.
+            call.abandoned = True
+            raise
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+            }
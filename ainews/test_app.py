@@ -0,0 +1,50 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+os.environ.setdefault("NEWSAPI_KEY", "test")
+os.environ.setdefault("AI_NEWS_STORE_ENABLED", "0")
+
+import app
+from article_store import ArticleStore
+from test_article_store import FakeNewsAPI, days_ago
+
+QUERY = "AI"
+
+
+class GetCachedArticlesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.api = FakeNewsAPI()
+        patches = [
+            mock.patch.object(app, "article_store",
+                              ArticleStore(os.path.join(self.tmp.name, "articles.db"))),
+            mock.patch.object(app, "fetch_ai_news_with_params", self.api),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        app.headline_cache.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_full_day_timestamp_range_does_not_wait_on_itself(self):
+        # The store fetches this range as a span whose bounds equal the request's.
+        day = days_ago(3)
+        result = []
+        worker = threading.Thread(
+            target=lambda: result.append(app.get_cached_articles(
+                f"{day}T00:00:00", f"{day}T23:59:59", 3, QUERY)),
+            daemon=True)
+        worker.start()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive(), "request waited on its own span fetch")
+        self.assertEqual(len(result[0]), 3)
+        self.assertEqual(self.api.calls, [(day, day, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
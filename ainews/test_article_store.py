@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from article_store import ArticleStore, utc_today
+
+QUERY = "AI"
+
+
+def days_ago(n):
+    # The store's notion of today, so runs near UTC midnight agree with it
+    return (date.fromisoformat(utc_today()) - timedelta(days=n)).isoformat()
+
+
+class FakeNewsAPI:
+    """Returns `per_day` articles for every day of a requested span."""
+
+    def __init__(self, per_day=5):
+        self.per_day = per_day
+        self.calls = []
+
+    def __call__(self, date_from, date_to, num_headlines, query):
+        self.calls.append((date_from[:10], date_to[:10], num_headlines))
+        day = date.fromisoformat(date_from[:10])
+        end = date.fromisoformat(date_to[:10])
+        articles = []
+        while day <= end:
+            for i in range(self.per_day):
+                articles.append({
+                    "title": f"AI story {i} on {day}",
+                    "url": f"https://example.com/{day}/{i}",
+                    "publishedAt": f"{day}T12:00:00Z",
+                })
+            day += timedelta(days=1)
+        return articles[:num_headlines]
+
+
+class ArticleStoreRangeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ArticleStore(os.path.join(self.tmp.name, "articles.db"))
+        self.api = FakeNewsAPI()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sub_range_of_a_capped_span_goes_upstream(self):
+        self.store.articles_for_range(days_ago(30), days_ago(24), 2, QUERY, self.api)
+        articles = self.store.articles_for_range(days_ago(26), days_ago(26), 2, QUERY, self.api)
+        self.assertEqual(len(self.api.calls), 2)
+        self.assertEqual(self.api.calls[-1][:2], (days_ago(26), days_ago(26)))
+        self.assertEqual(len(articles), 2)
+
+    def test_same_span_is_served_locally(self):
+        first = self.store.articles_for_range(days_ago(30), days_ago(24), 2, QUERY, self.api)
+        again = self.store.articles_for_range(days_ago(30), days_ago(24), 2, QUERY, self.api)
+        self.assertEqual(len(self.api.calls), 1)
+        self.assertEqual(first, again)
+
+    def test_deeper_request_for_a_capped_span_goes_upstream(self):
+        self.store.articles_for_range(days_ago(30), days_ago(24), 2, QUERY, self.api)
+        self.store.articles_for_range(days_ago(30), days_ago(24), 4, QUERY, self.api)
+        self.assertEqual(len(self.api.calls), 2)
+
+    def test_sub_range_of_an_exhausted_span_is_served_locally(self):
+        self.store.articles_for_range(days_ago(30), days_ago(24), 100, QUERY, self.api)
+        articles = self.store.articles_for_range(days_ago(26), days_ago(26), 3, QUERY, self.api)
+        self.assertEqual(len(self.api.calls), 1)
+        self.assertEqual(len(articles), 3)
+
+    def test_union_of_capped_spans_is_served_locally(self):
+        self.store.articles_for_range(days_ago(30), days_ago(28), 2, QUERY, self.api)
+        self.store.articles_for_range(days_ago(27), days_ago(24), 2, QUERY, self.api)
+        self.store.articles_for_range(days_ago(30), days_ago(24), 2, QUERY, self.api)
+        self.assertEqual(len(self.api.calls), 2)
+
+    def test_only_the_untiled_part_goes_upstream(self):
+        self.store.articles_for_range(days_ago(30), days_ago(28), 2, QUERY, self.api)
+        self.store.articles_for_range(days_ago(30), days_ago(24), 2, QUERY, self.api)
+        self.assertEqual(self.api.calls[-1][:2], (days_ago(27), days_ago(24)))
+
+
+if __name__ == "__main__":
+    unittest.main()
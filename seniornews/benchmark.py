@@ -0,0 +1,253 @@
+"""
+Offline throughput benchmark for the senior news spider and pipelines.
+
+    python benchmark.py                 # crawl fixtures + micro-benchmarks
+    python benchmark.py --record        # refresh bench_fixtures/ from the live sites
+
+Recorded pages in bench_fixtures/ (or generated ones for sites without
+recordings) are served from a local HTTP server, and the real spider and
+cleaning pipeline crawl them in a separate process with its own CPU and memory
+accounting. Reports pages/sec, items/sec, CPU time and peak RSS, then times
+the extraction and date-normalization paths in isolation. Results are written
+to bench_results/ as JSON; pass --compare with an earlier file to print the
+change against it.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'seniornews.settings')
+
+from scrapy.http import HtmlResponse  # noqa: E402
+
+from seniornews.extraction import ExtractionEngine  # noqa: E402
+from seniornews.feeds import parse_date  # noqa: E402
+from seniornews.fixtures import (load_fixtures, make_server, record_fixtures,  # noqa: E402
+                                 synthetic_fixtures)
+from seniornews.pipelines import SeniorNewsCleaningPipeline  # noqa: E402
+from seniornews.sites import SITES  # noqa: E402
+
+FIXTURE_DIR = os.path.join(HERE, 'bench_fixtures')
+
+
+def load_pages(args):
+    """Recorded fixtures, topped up with generated pages for the other sites."""
+    pages, recorded = load_fixtures(args.fixtures, SITES)
+    generated = {domain: site for domain, site in SITES.items() if domain not in recorded}
+    pages.update(synthetic_fixtures(generated, args.articles_per_page, args.pages))
+    return pages, recorded
+
+
+def crawl_settings(server_url, state_dir, concurrency):
+    """Project settings with everything stateful or throttling switched off."""
+    return {
+        'FIXTURE_SERVER_URL': server_url,
+        'DOWNLOADER_MIDDLEWARES': {'seniornews.fixtures.FixtureRoutingMiddleware': 100,
+                                   'seniornews.middlewares.CrawlStateMiddleware': None,
+                                   'seniornews.middlewares.SeniornewsDownloaderMiddleware': None},
+        'SPIDER_MIDDLEWARES': {'seniornews.middlewares.SeniornewsSpiderMiddleware': None},
+        'ITEM_PIPELINES': {'seniornews.pipelines.SeniorNewsCleaningPipeline': 300},
+        'EXTENSIONS': {'seniornews.throttle.DomainThrottle': None},
+        'ROBOTSTXT_OBEY': False,
+        'HTTPCACHE_ENABLED': False,
+        'METRICS_ENABLED': False,
+        'DOWNLOAD_DELAY': 0,
+        'CONCURRENT_REQUESTS': concurrency,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency,
+        'JOBDIR': None,
+        'LOG_LEVEL': 'WARNING',
+        'TELNETCONSOLE_ENABLED': False,
+        'CRAWLSTATE_PATH': os.path.join(state_dir, 'crawlstate.db'),
+    }
+
+
+def run_crawl_worker(args):
+    """Runs the crawl in this process and prints its measurements as JSON."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from seniornews.spiders.senior_living_spider import SeniorLivingNewsSpider
+
+    settings = get_project_settings()
+    with tempfile.TemporaryDirectory() as state_dir:
+        settings.setdict(crawl_settings(args.server_url, state_dir, args.concurrency),
+                         priority='cmdline')
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(SeniorLivingNewsSpider)
+        process.crawl(crawler, discovery='html')
+        started = time.perf_counter()
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        process.start()
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        wall = time.perf_counter() - started
+
+    stats = crawler.stats.get_stats()
+    elapsed = stats.get('elapsed_time_seconds') or wall
+    pages = stats.get('response_received_count', 0)
+    items = stats.get('item_scraped_count', 0)
+    print(json.dumps({
+        'pages': pages,
+        'items': items,
+        'dropped': stats.get('item_dropped_count', 0),
+        'elapsed_seconds': round(elapsed, 3),
+        'pages_per_second': round(pages / elapsed, 1) if elapsed else None,
+        'items_per_second': round(items / elapsed, 1) if elapsed else None,
+        'cpu_seconds': round((after.ru_utime - before.ru_utime)
+                             + (after.ru_stime - before.ru_stime), 3),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(after.ru_maxrss / 1024, 1),
+    }))
+
+
+def run_crawl(args, pages):
+    server = make_server(pages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server_url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--crawl-worker',
+             '--server-url', server_url, '--concurrency', str(args.concurrency)],
+            cwd=HERE, text=True)
+    finally:
+        server.shutdown()
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def timed(fn, repeat):
+    """Microseconds per call, best of three runs of `repeat` calls."""
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        per_call = (time.perf_counter() - started) / repeat * 1e6
+        best = per_call if best is None else min(best, per_call)
+    return round(best, 2)
+
+
+def micro_benchmarks(pages, repeat):
+    engine = ExtractionEngine(SITES)
+    results = {}
+    for domain, site in SITES.items():
+        start = site['start_url']
+        listing = HtmlResponse(start, body=pages[start][2], encoding='utf-8')
+        rules = engine.rules_for(start)
+        links, _ = engine.extract_links(listing, rules)
+        if not links:
+            continue
+        article_url = listing.urljoin(links[0])
+        if article_url not in pages:
+            continue
+        body = pages[article_url][2]
+        fields = ['title', 'author', 'publication_date']
+
+        def extract(rules=rules):
+            # A fresh response each call, so parsing is part of the cost
+            engine.extract(HtmlResponse(article_url, body=body, encoding='utf-8'), rules, fields)
+
+        def extract_links(rules=rules):
+            engine.extract_links(HtmlResponse(start, body=pages[start][2], encoding='utf-8'), rules)
+
+        results[domain] = {
+            'fast_path': rules.fast,
+            'extract_us': timed(extract, repeat),
+            'extract_links_us': timed(extract_links, repeat),
+        }
+
+    pipeline = SeniorNewsCleaningPipeline()
+    item = {'title': '  A story  ', 'author': ' Jane ', 'url': 'https://example.com/a',
+            'publication_date': '2026-10-01T12:31:42-05:00'}
+    results['dates'] = {
+        'cleaning_pipeline_us': timed(lambda: pipeline.process_item(dict(item), None), repeat * 10),
+        'parse_date_iso_us': timed(lambda: parse_date('2026-10-01T12:31:42Z'), repeat * 10),
+        'parse_date_rfc822_us': timed(lambda: parse_date('Thu, 01 Oct 2026 12:31:42 -0500'),
+                                      repeat * 10),
+    }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f'\nCompared with {previous_path}:')
+    for key in ('pages_per_second', 'items_per_second', 'cpu_seconds', 'peak_rss_mb'):
+        print(f"  {key:<18} {previous['crawl'].get(key)} -> {current['crawl'].get(key)}")
+    for name, timings in current['micro'].items():
+        before = previous['micro'].get(name, {})
+        for key, value in timings.items():
+            if key.endswith('_us') and key in before:
+                print(f'  {name} {key:<22} {before[key]} -> {value} us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the spider and pipelines offline.')
+    parser.add_argument('--fixtures', default=FIXTURE_DIR)
+    parser.add_argument('--record', action='store_true',
+                        help='record fixtures from the live sites and exit')
+    parser.add_argument('--articles', type=int, default=20,
+                        help='articles to record per site')
+    parser.add_argument('--pages', type=int, default=5,
+                        help='listing pages per site for generated fixtures')
+    parser.add_argument('--articles-per-page', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=200, help='calls per micro-benchmark')
+    parser.add_argument('--output', default=None, help='result file (default: bench_results/)')
+    parser.add_argument('--compare', default=None, help='earlier result file to compare with')
+    parser.add_argument('--crawl-worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--server-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crawl_worker:
+        run_crawl_worker(args)
+        return
+    if args.record:
+        from scrapy.utils.project import get_project_settings
+        record_fixtures(args.fixtures, SITES, get_project_settings().get('USER_AGENT'),
+                        args.articles)
+        return
+
+    pages, recorded = load_pages(args)
+    result = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'config': vars(args),
+        'recorded_sites': recorded,
+        'fixture_pages': len(pages),
+    }
+    result['crawl'] = crawl = run_crawl(args, pages)
+    print(f"crawl  {crawl['pages']} pages, {crawl['items']} items in {crawl['elapsed_seconds']}s  "
+          f"{crawl['pages_per_second']} pages/s  {crawl['items_per_second']} items/s  "
+          f"cpu {crawl['cpu_seconds']}s  peak rss {crawl['peak_rss_mb']} MB")
+    result['micro'] = micro = micro_benchmarks(pages, args.repeat)
+    for name, timings in micro.items():
+        print(f'{name:<28} ' + '  '.join(f'{k} {v}' for k, v in timings.items()))
+
+    output = args.output or os.path.join(
+        HERE, 'bench_results', f'benchmark-{datetime.now():%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'Results written to {output}')
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == '__main__':
+    main()
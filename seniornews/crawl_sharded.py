@@ -0,0 +1,99 @@
+"""Crawl the senior living sites with several Scrapy processes at once.
+
+Sites are spread over worker processes, and large sites can be split across
+workers by URL hash with --split. Each worker keeps its own crawl state, dedup
+filters, HTTP cache and feed under shards/worker-N/; when all are done their
+new items are merged into the main feed that select_top_articles.py reads.
+Keep --workers and --split stable between runs so workers find their state.
+
+Usage:
+    python crawl_sharded.py --workers 4 --split seniorhousingnews.com=2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from scrapy.utils.project import get_project_settings
+
+from seniornews.shards import merge_feeds, plan_shards, shard_shares
+from seniornews.sites import SITES
+
+SHARD_DIR = os.getenv('SENIORNEWS_SHARD_DIR', 'shards')
+
+
+def worker_command(plan, directory, shares, args):
+    """The scrapy crawl command line for one worker."""
+    settings = {
+        'CRAWLSTATE_PATH': os.path.join(directory, 'crawlstate.db'),
+        'DEDUP_DIR': os.path.join(directory, 'dedup'),
+        'FEEDSTORE_DIR': os.path.join(directory, 'feed'),
+        'HTTPCACHE_DIR': os.path.join(directory, 'httpcache'),
+        'METRICS_REPORT': os.path.join(directory, 'reports', 'crawl-%(time)s.json'),
+        'LOG_FILE': os.path.join(directory, 'crawl.log'),
+    }
+    if shares:
+        settings['DOMAIN_THROTTLE_SHARES'] = json.dumps(shares)
+    if args.httpcache:
+        settings['HTTPCACHE_ENABLED'] = 1
+    command = [sys.executable, '-m', 'scrapy', 'crawl', 'senior_living_news',
+               '-a', 'domains=' + ','.join(plan['domains'])]
+    if plan['shards']:
+        command += ['-a', 'shards=' + ','.join(f'{domain}:{i}/{n}'
+                                               for domain, (i, n) in plan['shards'].items())]
+    if args.discovery:
+        command += ['-a', 'discovery=' + args.discovery]
+    if args.since:
+        command += ['-a', 'since=' + args.since]
+    for name, value in settings.items():
+        command += ['-s', f'{name}={value}']
+    return command
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, len(SITES)),
+                        help='number of crawl processes (default: one per site, up to the CPU count)')
+    parser.add_argument('--split', action='append', default=[], metavar='DOMAIN=N',
+                        help='split a site across N workers by URL hash')
+    parser.add_argument('--discovery', choices=['feeds', 'html'])
+    parser.add_argument('--since', help='ISO date cutoff for feed entries')
+    parser.add_argument('--httpcache', action='store_true',
+                        help="cache responses in each worker's directory (development crawls)")
+    args = parser.parse_args()
+
+    split = dict(entry.split('=', 1) for entry in args.split)
+    plans = plan_shards(list(SITES), args.workers, split)
+    shares = shard_shares(plans)
+    settings = get_project_settings()
+
+    started = time.time()
+    processes = []
+    directories = []
+    for index, plan in enumerate(plans):
+        directory = os.path.abspath(os.path.join(SHARD_DIR, f'worker-{index}'))
+        os.makedirs(directory, exist_ok=True)
+        command = worker_command(plan, directory, shares, args)
+        print(f"Worker {index}: {', '.join(plan['domains'])}"
+              + (f" (shards {plan['shards']})" if plan['shards'] else ''))
+        processes.append(subprocess.Popen(command))
+        directories.append(directory)
+
+    failed = [index for index, process in enumerate(processes) if process.wait() != 0]
+    for index in failed:
+        print(f'Worker {index} failed; see {directories[index]}/crawl.log')
+    print(f'Crawled with {len(plans)} workers in {time.time() - started:.1f}s')
+
+    written, dropped = merge_feeds([os.path.join(d, 'feed') for d in directories],
+                                   settings.get('FEEDSTORE_DIR', 'feed'),
+                                   settings.get('DEDUP_DIR', 'dedup'),
+                                   settings.getint('FEEDSTORE_MAX_BYTES', 64 * 1024 * 1024))
+    print(f'Merged {written} new articles into {settings.get("FEEDSTORE_DIR", "feed")} '
+          f'({dropped} duplicates across workers dropped)')
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
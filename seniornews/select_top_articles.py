@@ -1,81 +1,143 @@
-import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 from typing import List, Dict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from mailchimp3 import MailChimp
+from seniornews.feedstore import FeedReader, iter_articles
+from seniornews import ranking
+from seniornews.neardup import FeaturedIndex, MinHasher, distinct
+from seniornews.ranking import HashingScorer, TfidfRanker, TopK, parse_dates, top_k_indices
+
+FEED_DIR = os.getenv('SENIORNEWS_FEED_DIR', 'feed')
+FEED_CHECKPOINT = os.getenv('SENIORNEWS_FEED_CHECKPOINT', os.path.join(FEED_DIR, 'checkpoint.json'))
+RANKING_STATE = os.getenv('SENIORNEWS_RANKING_STATE', 'ranking_state.json')
+SCORE_CACHE = os.getenv('SENIORNEWS_SCORE_CACHE', 'fulltext_scores.json')
+FEATURED_INDEX = os.getenv('SENIORNEWS_FEATURED_INDEX', 'featured_index.json')
+# "fulltext" scores title and body text; "title" scores titles with the
+# persisted TF-IDF model
+SCORER = os.getenv('SENIORNEWS_SCORER', 'fulltext')
+# Articles published more than this many days ago are skipped; 0 keeps all
+MAX_AGE_DAYS = int(os.getenv('SENIORNEWS_MAX_AGE_DAYS', '0'))
+
+# The only fields the ranker and the newsletter use
+RANK_FIELDS = ('title', 'url', 'publication_date')
+FULLTEXT_FIELDS = RANK_FIELDS + ('body',)
+
+# Candidates kept per newsletter slot while streaming: each of the five
+# publishers may cover the same story once, so this always leaves enough
+# distinct stories after near-duplicates are dropped
+CANDIDATES_PER_SLOT = 5
+
+# Keywords related to senior living industry
+INDUSTRY_KEYWORDS = [
+    "senior living", "retirement", "assisted living", "memory care",
+    "senior housing", "healthcare", "nursing", "elderly", "aging",
+    "community", "wellness", "care", "facility", "residents",
+    "technology", "innovation", "development", "investment"
+]
+
+# Reference text built from the keywords that titles are compared with
+REFERENCE_TEXT = " ".join(INDUSTRY_KEYWORDS)
 
 def load_articles(json_file):
-    """Load articles from JSON file."""
-    with open(json_file, 'r') as f:
-        return json.load(f)
+    """Load articles from a JSON file, or stream them from a feed directory.
+
+    For a feed directory written by FeedStorePipeline, every complete
+    segment is read; use FeedReader with a checkpoint to read only new ones.
+    """
+    return list(iter_articles(json_file))
+
+def stream_articles(source, fields=RANK_FIELDS, since=None):
+    """Lazily yield articles from a JSON array, JSONL or gzip/zstd export.
 
-def rank_articles(articles, top_n=5):
+    Articles are projected to `fields` and those published before `since`
+    are dropped while parsing, so memory does not grow with the file.
+    """
+    return iter_articles(source, fields=fields, since=since)
+
+def rank_articles(articles, top_n=5, ranker=None, featured=None):
     """Rank articles by relevance using NLP.
     
     The ranking is based on:
     1. Recency (newer articles get higher scores)
     2. Relevance to senior living industry topics
+
+    Pass a persisted TfidfRanker to reuse its vocabulary, IDF statistics and
+    cached scores, or a HashingScorer to score the article bodies; by
+    default a throwaway TfidfRanker is fitted on these titles.
+
+    Near-duplicate stories only take one slot, the best-scoring version,
+    and stories found in the `featured` FeaturedIndex are skipped.
     """
-    # Keywords related to senior living industry
-    industry_keywords = [
-        "senior living", "retirement", "assisted living", "memory care",
-        "senior housing", "healthcare", "nursing", "elderly", "aging",
-        "community", "wellness", "care", "facility", "residents",
-        "technology", "innovation", "development", "investment"
-    ]
-    
-    # Create a reference text from keywords
-    reference_text = " ".join(industry_keywords)
-    
-    # Process titles for similarity comparison
-    titles = [article['title'] for article in articles]
-    
-    # Create TF-IDF vectorizer
-    vectorizer = TfidfVectorizer(stop_words='english')
-    
-    # Add reference text to the documents
-    all_docs = titles + [reference_text]
-    tfidf_matrix = vectorizer.fit_transform(all_docs)
+    if ranker is None:
+        ranker = TfidfRanker(REFERENCE_TEXT)
     
     # Calculate similarity scores with the reference text
-    similarity_scores = cosine_similarity(tfidf_matrix[:-1], tfidf_matrix[-1].reshape(1, -1)).flatten()
-    
-    # Calculate recency scores
-    current_time = datetime.now()
-    recency_scores = []
+    similarity_scores = ranker.similarities(articles)
     
-    for article in articles:
-        try:
-            pub_date = datetime.fromisoformat(article['publication_date'].replace('Z', '+00:00'))
-            # Convert time difference to days and normalize
-            days_old = (current_time - pub_date).days
-            recency_score = 1 / (1 + days_old)  # Newer articles get higher scores
-        except (ValueError, TypeError, AttributeError):
-            recency_score = 0
-        recency_scores.append(recency_score)
+    # Calculate recency scores from the publication dates, parsed in one pass
+    timestamps = parse_dates([article.get('publication_date') for article in articles])
+    recency_scores = ranking.recency_scores(timestamps, datetime.now(timezone.utc).timestamp())
     
     # Normalize scores
-    recency_scores = np.array(recency_scores)
     recency_scores = recency_scores / recency_scores.max() if recency_scores.max() > 0 else recency_scores
     
     # Combine relevance and recency scores (0.7 weight for relevance, 0.3 for recency)
     final_scores = 0.7 * similarity_scores + 0.3 * recency_scores
     
-    # Get indices of top N articles
-    top_indices = final_scores.argsort()[-top_n:][::-1]
+    # Walk articles from the highest score down, keeping the best version of
+    # each story not featured before
+    order = np.argsort(-final_scores, kind='stable')
+    candidates = ((float(final_scores[idx]), articles[idx]) for idx in order
+                  if featured is None or not featured.contains(articles[idx]))
     
     # Return top articles with their scores
     top_articles = []
-    for idx in top_indices:
-        article = articles[idx].copy()
-        article['relevance_score'] = float(final_scores[idx])
+    for score, article in distinct(candidates, top_n):
+        article = article.copy()
+        article['relevance_score'] = score
         top_articles.append(article)
     
     return top_articles
 
+def rank_articles_streaming(articles, top_n=5, ranker=None, chunk_size=10000, featured=None):
+    """Rank an iterable of articles chunk by chunk in bounded memory.
+    
+    Scores are computed per chunk with NumPy and only a running top-N heap
+    is kept, so memory stays flat however many articles there are. Unlike
+    rank_articles, recency is normalized by its upper bound (1, an article
+    published today) rather than the corpus maximum, which is unknown until
+    every article has been read, and each chunk is weighted with the IDF
+    statistics seen up to that chunk.
+
+    A few candidates per slot are kept so that near-duplicates can be
+    collapsed at the end, as in rank_articles; featured stories are dropped
+    per chunk before they can take a candidate place.
+    """
+    if ranker is None:
+        ranker = TfidfRanker(REFERENCE_TEXT)
+    now = datetime.now(timezone.utc).timestamp()
+    pool = top_n * CANDIDATES_PER_SLOT
+    top = TopK(pool)
+    hasher = featured.hasher if featured is not None else MinHasher()
+    
+    for chunk in iter(lambda: list(islice(articles, chunk_size)), []):
+        similarity_scores = ranker.similarities(chunk)
+        timestamps = parse_dates([article.get('publication_date') for article in chunk])
+        final_scores = 0.7 * similarity_scores + 0.3 * ranking.recency_scores(timestamps, now)
+        for idx in top_k_indices(final_scores, pool):
+            if featured is not None and featured.contains(chunk[idx]):
+                continue
+            top.push(float(final_scores[idx]), chunk[idx])
+    
+    top_articles = []
+    for score, article in distinct(top.items(), top_n, hasher):
+        article = article.copy()
+        article['relevance_score'] = score
+        top_articles.append(article)
+    return top_articles
+
 def format_mailchimp_content(articles: List[Dict]) -> str:
     """Format the top articles into Mailchimp-compatible HTML format.
     
@@ -154,11 +216,35 @@ def send_to_mailchimp(content: str, api_key: str = None, list_id: str = None) ->
     return campaign_info
 
 def main():
-    # Load articles
-    articles = load_articles('output.json')
+    # Load the articles scraped since the last newsletter, falling back to
+    # a one-off `scrapy crawl -o output.json` export
+    fields = FULLTEXT_FIELDS if SCORER == 'fulltext' else RANK_FIELDS
+    since = None
+    if MAX_AGE_DAYS:
+        since = datetime.now(timezone.utc) - timedelta(days=MAX_AGE_DAYS)
+    reader = None
+    if os.path.isdir(FEED_DIR):
+        reader = FeedReader(FEED_DIR, FEED_CHECKPOINT)
+        articles = reader.items(fields=fields, since=since)
+    else:
+        articles = stream_articles('output.json', fields=fields, since=since)
     
-    # Rank and select top articles
-    top_articles = rank_articles(articles)
+    # Rank and select top articles in streaming chunks, on the full text or
+    # the title model, reusing the scores and model kept from earlier runs
+    if SCORER == 'fulltext':
+        ranker = HashingScorer(REFERENCE_TEXT, SCORE_CACHE)
+    else:
+        ranker = TfidfRanker(REFERENCE_TEXT, RANKING_STATE)
+    featured = FeaturedIndex(FEATURED_INDEX)
+    try:
+        top_articles = rank_articles_streaming(articles, ranker=ranker, featured=featured)
+    finally:
+        if isinstance(ranker, HashingScorer):
+            ranker.close()
+    ranker.save()
+    if not top_articles:
+        print("No new articles to rank.")
+        return
     
     # Format content for Mailchimp
     mailchimp_content = format_mailchimp_content(top_articles)
@@ -174,8 +260,20 @@ def main():
         print("Note: The campaign is created as a draft. Log into Mailchimp to review and send.")
     except Exception as e:
         print(f"Error sending to Mailchimp: {str(e)}")
+        response = None
     
     print("Newsletter content has been generated! Check newsletter_content.html")
 
+    # Only move past these segments, and remember the stories as featured,
+    # once the campaign exists; otherwise the next run ranks them again
+    if response is None:
+        print("Articles were not marked as featured, since the campaign was not created.")
+        return
+    for article in top_articles:
+        featured.feature(article)
+    featured.save()
+    if reader is not None:
+        reader.commit()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,93 @@
+# Persistent crawl state for incremental crawling.
+#
+# Every page the spider downloads is recorded here by URL fingerprint along
+# with its ETag, Last-Modified header and a hash of its body, so the next crawl
+# can send conditional requests and skip pages that have not changed.
+
+import hashlib
+import sqlite3
+import time
+
+from w3lib.url import canonicalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_changed REAL NOT NULL
+);
+"""
+
+
+def url_fingerprint(url):
+    """Fingerprint of the canonical form of a URL."""
+    return hashlib.sha1(canonicalize_url(url).encode("utf-8")).hexdigest()
+
+
+def content_hash(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+class CrawlState:
+    """SQLite index of previously crawled pages keyed by URL fingerprint.
+
+    Args:
+        path: Location of the SQLite database
+        recheck_after: Seconds during which a page seen before is considered
+            fresh and is not requested again at all
+    """
+
+    def __init__(self, path, recheck_after=0):
+        self.path = path
+        self.recheck_after = recheck_after
+        # Autocommit, so state survives a crawl that is killed partway.
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, url):
+        """Returns the stored record for a URL as a dict, or None."""
+        cursor = self.conn.execute(
+            "SELECT url, etag, last_modified, content_hash, first_seen, last_seen, last_changed "
+            "FROM pages WHERE fingerprint = ?", (url_fingerprint(url),))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([c[0] for c in cursor.description], row))
+
+    def is_known(self, url):
+        return self.get(url) is not None
+
+    def is_fresh(self, url):
+        """True if the URL was seen within recheck_after seconds."""
+        record = self.get(url)
+        return record is not None and time.time() - record["last_seen"] < self.recheck_after
+
+    def touch(self, url):
+        """Records that a URL was confirmed unchanged (e.g. a 304 response)."""
+        self.conn.execute("UPDATE pages SET last_seen = ? WHERE fingerprint = ?",
+                          (time.time(), url_fingerprint(url)))
+
+    def update(self, url, etag, last_modified, body_hash):
+        """Stores the latest validators for a URL; returns True if the content changed."""
+        now = time.time()
+        record = self.get(url)
+        changed = record is None or record["content_hash"] != body_hash
+        self.conn.execute(
+            "INSERT INTO pages (fingerprint, url, etag, last_modified, content_hash, "
+            "first_seen, last_seen, last_changed) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (fingerprint) DO UPDATE SET url = excluded.url, "
+            "etag = excluded.etag, last_modified = excluded.last_modified, "
+            "content_hash = excluded.content_hash, last_seen = excluded.last_seen, "
+            "last_changed = CASE WHEN pages.content_hash = excluded.content_hash "
+            "THEN pages.last_changed ELSE excluded.last_changed END",
+            (url_fingerprint(url), url, etag, last_modified, body_hash, now, now, now))
+        return changed
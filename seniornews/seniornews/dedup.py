@@ -0,0 +1,164 @@
+# Duplicate story detection across URLs, crawls and publishers.
+#
+# A story is identified both by its canonical URL (tracking parameters, www,
+# AMP variants and fragments removed) and by a fingerprint of its normalized
+# title, which catches the same story syndicated to another publisher. Seen
+# keys are kept in Bloom filters: the active one lives in memory and, once
+# full, is written to disk and memory-mapped read-only, so resident memory
+# stays bounded however many crawls the state covers.
+
+import glob
+import hashlib
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from math import ceil, log
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from w3lib.url import canonicalize_url
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid',
+                   'ref', 'cmpid', 'amp', 'outputtype'}
+TRACKING_PREFIXES = ('utm_', 'hsa_', '_hs')
+
+# Titles shorter than this are too generic ("Weekly roundup") to fingerprint
+MIN_TITLE_WORDS = 4
+
+
+def canonical_url(url):
+    """Returns the form of a URL shared by all its tracking and AMP variants."""
+    parts = urlsplit(canonicalize_url(url))
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'amp.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r'/amp/?$', '/', parts.path)
+    path = path.rstrip('/') or '/'
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if k.lower() not in TRACKING_PARAMS
+                       and not k.lower().startswith(TRACKING_PREFIXES)])
+    return urlunsplit(('https', host, path, query, ''))
+
+
+def normalize_title(title):
+    title = unicodedata.normalize('NFKC', title).lower()
+    title = re.sub(r'[^\w\s]', ' ', title)
+    return ' '.join(title.split())
+
+
+def title_fingerprint(title):
+    """Fingerprint of a normalized title, or None if it is too short to trust."""
+    normalized = normalize_title(title or '')
+    if len(normalized.split()) < MIN_TITLE_WORDS:
+        return None
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over a bytearray or a read-only memory map."""
+
+    HEADER = struct.Struct('<8sQII')
+    MAGIC = b'SNBLOOM1'
+
+    def __init__(self, capacity, error_rate, bits=None, hashes=None, count=0, data=None):
+        if bits is None:
+            bits = ceil(-capacity * log(error_rate) / log(2) ** 2)
+            hashes = max(1, round(bits / capacity * log(2)))
+        self.capacity = capacity
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+        self.data = data if data is not None else bytearray((bits + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        data = self.data
+        return all(data[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.data[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.bits, self.hashes, self.count))
+            f.write(self.data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, capacity, writable=False):
+        """Loads a saved filter, into memory if writable, else memory-mapped."""
+        with open(path, 'rb') as f:
+            magic, bits, hashes, count = cls.HEADER.unpack(f.read(cls.HEADER.size))
+            if magic != cls.MAGIC:
+                raise ValueError(f'{path} is not a Bloom filter file')
+            if writable:
+                data = bytearray(f.read())
+            else:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(mapped)[cls.HEADER.size:]
+        return cls(capacity, None, bits=bits, hashes=hashes, count=count, data=data)
+
+
+class SeenStore:
+    """Persistent set of seen keys backed by generations of Bloom filters.
+
+    Args:
+        directory: Where filter generations are stored
+        capacity: Keys per generation before it is spilled to disk
+        error_rate: False positive rate of each generation
+        max_generations: Oldest generations beyond this are deleted, so very
+            old stories are eventually forgotten
+    """
+
+    def __init__(self, directory, capacity=100000, error_rate=0.001, max_generations=24):
+        self.directory = directory
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_generations = max_generations
+        os.makedirs(directory, exist_ok=True)
+        self.frozen = [BloomFilter.load(path, capacity)
+                       for path in sorted(glob.glob(os.path.join(directory, 'bloom-*.bin')))]
+        active = os.path.join(directory, 'active.bin')
+        if os.path.exists(active):
+            self.active = BloomFilter.load(active, capacity, writable=True)
+        else:
+            self.active = BloomFilter(capacity, error_rate)
+
+    def __contains__(self, key):
+        return key in self.active or any(key in f for f in reversed(self.frozen))
+
+    def add(self, key):
+        self.active.add(key)
+        if self.active.full:
+            self._spill()
+
+    def _spill(self):
+        generation = len(self.frozen) and int(os.path.basename(
+            self._generations()[-1])[len('bloom-'):-len('.bin')]) + 1
+        path = os.path.join(self.directory, f'bloom-{generation:06d}.bin')
+        self.active.save(path)
+        self.frozen.append(BloomFilter.load(path, self.capacity))
+        self.active = BloomFilter(self.capacity, self.error_rate)
+        while len(self.frozen) > self.max_generations:
+            self.frozen.pop(0)
+            os.remove(self._generations()[0])
+
+    def _generations(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'bloom-*.bin')))
+
+    def close(self):
+        self.active.save(os.path.join(self.directory, 'active.bin'))
@@ -0,0 +1,168 @@
+# Declarative extraction of article links and fields from site rules.
+#
+# The rules in sites.py are compiled once into lxml XPath objects and looked up
+# by host, so handling a response costs one dict lookup plus the selectors of
+# its own site, instead of a chain of substring tests and re-parsed CSS.
+
+import logging
+from urllib.parse import urlparse
+
+from lxml import etree
+from parsel.csstranslator import css2xpath
+
+from .sites import GENERIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Fields made of every matching text node rather than the first one
+JOINED_FIELDS = {'body'}
+
+
+def compile_selector(css):
+    """Compiles a CSS selector (with ::text / ::attr()) to a reusable XPath."""
+    return etree.XPath(css2xpath(css), smart_strings=False)
+
+
+def first_match(selectors, root):
+    """Returns the first non-empty stripped string any selector matches."""
+    for selector in selectors:
+        for value in selector(root):
+            if isinstance(value, str):
+                value = value.strip()
+                if value:
+                    return value
+    return None
+
+
+def joined_match(selectors, root):
+    """Returns the text of the first selector that matches, joined with spaces."""
+    for selector in selectors:
+        parts = [value.strip() for value in selector(root) if isinstance(value, str)]
+        text = ' '.join(part for part in parts if part)
+        if text:
+            return text
+    return None
+
+
+class SiteRules:
+    """The compiled extraction rules of one site."""
+
+    def __init__(self, domain, config, generic=GENERIC_FIELDS):
+        self.domain = domain
+        self.fast = config.get('fast', False)
+        self.links = [compile_selector(css) for css in config.get('links', [])]
+        self.next_page = [compile_selector(css) for css in config.get('next_page', [])]
+        fields = config.get('fields', {})
+        # Site selectors first, then the generic meta tag fallbacks
+        self.fields = {
+            name: ([compile_selector(css) for css in fields.get(name, [])],
+                   [compile_selector(css) for css in generic.get(name, [])])
+            for name in set(fields) | set(generic)
+        }
+
+
+class ExtractionEngine:
+    """Extracts links and item fields from responses using per-site rules.
+
+    Every field lookup is counted as a hit or miss per site in the crawl
+    stats (extraction/<domain>/<field>/hit|miss), and as a fallback when only
+    the generic selectors matched, so broken selectors show up in the stats
+    dump at the end of each crawl.
+
+    Args:
+        sites: Mapping of domain to site config, as in sites.SITES
+        stats: Scrapy stats collector, or None to keep counts local only
+    """
+
+    def __init__(self, sites, stats=None, generic=GENERIC_FIELDS):
+        self.rules = {domain: SiteRules(domain, config, generic)
+                      for domain, config in sites.items()}
+        self.stats = stats
+        self.counts = {}
+        self._hosts = {}
+        self._parsers = {}
+
+    def rules_for(self, url):
+        """Returns the rules of the site a URL belongs to, or None."""
+        host = urlparse(url).hostname or ''
+        try:
+            return self._hosts[host]
+        except KeyError:
+            pass
+        rules = None
+        labels = host.split('.')
+        for i in range(len(labels)):
+            rules = self.rules.get('.'.join(labels[i:]))
+            if rules is not None:
+                break
+        self._hosts[host] = rules
+        return rules
+
+    def _root(self, response, rules):
+        if not rules.fast:
+            return response.selector.root
+        # Parse the raw body directly, without building a Scrapy selector
+        parser = self._parsers.get(response.encoding)
+        if parser is None:
+            parser = self._parsers[response.encoding] = etree.HTMLParser(
+                encoding=response.encoding)
+        return etree.fromstring(response.body, parser)
+
+    def _count(self, rules, field, outcome):
+        key = f'extraction/{rules.domain}/{field}/{outcome}'
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self.stats is not None:
+            self.stats.inc_value(key)
+
+    def extract_links(self, response, rules):
+        """Returns (article links, next page link or None) of a listing page."""
+        root = self._root(response, rules)
+        if root is None:
+            return [], None
+        links = []
+        for selector in rules.links:
+            links.extend(value.strip() for value in selector(root) if isinstance(value, str))
+        self._count(rules, 'links', 'hit' if links else 'miss')
+        next_page = first_match(rules.next_page, root) if rules.next_page else None
+        return list(dict.fromkeys(links)), next_page
+
+    def extract(self, response, rules, fields):
+        """Returns a dict of the given fields that could be extracted."""
+        root = self._root(response, rules)
+        if root is None:
+            return {}
+        values = {}
+        for field in fields:
+            if field not in rules.fields:
+                continue
+            match = joined_match if field in JOINED_FIELDS else first_match
+            own, generic = rules.fields[field]
+            value = match(own, root)
+            if value is None:
+                value = match(generic, root)
+                if value is not None and own:
+                    self._count(rules, field, 'fallback')
+            if value is None:
+                self._count(rules, field, 'miss')
+            else:
+                self._count(rules, field, 'hit')
+                values[field] = value
+        return values
+
+    def hit_rates(self):
+        """Returns the share of lookups that matched, per site and field."""
+        rates = {}
+        for key, hits in self.counts.items():
+            if key.endswith('/hit'):
+                name = key[len('extraction/'):-len('/hit')]
+                misses = self.counts.get(key[:-len('hit')] + 'miss', 0)
+                rates[name] = hits / (hits + misses)
+        for key in self.counts:
+            if key.endswith('/miss'):
+                name = key[len('extraction/'):-len('/miss')]
+                rates.setdefault(name, 0.0)
+        return dict(sorted(rates.items()))
+
+    def log_summary(self):
+        for name, rate in self.hit_rates().items():
+            logger.info('Extraction hit rate %s: %.0f%%', name, rate * 100)
@@ -0,0 +1,58 @@
+# Parsing of sitemaps and RSS/Atom feeds for feed-driven article discovery.
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from scrapy.selector import Selector
+from scrapy.utils.gz import gunzip
+
+
+def parse_date(value):
+    """Parse an ISO 8601 (sitemap, Atom) or RFC 822 (RSS) date as aware UTC."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+def parse_feed(body):
+    """Extract entries from a sitemap, sitemap index, RSS or Atom document.
+
+    Returns:
+        tuple: (entries, sitemaps) where entries is a list of (url, date) for
+        articles and sitemaps a list of (url, date) for child sitemaps of a
+        sitemap index. Dates are aware UTC datetimes, or None if missing.
+    """
+    if body[:2] == b'\x1f\x8b':
+        body = gunzip(body)
+    selector = Selector(text=body.decode('utf-8', errors='replace'), type='xml')
+    selector.remove_namespaces()
+
+    sitemaps = [(s.xpath('loc/text()').get('').strip(), parse_date(s.xpath('lastmod/text()').get()))
+                for s in selector.xpath('/sitemapindex/sitemap')]
+
+    entries = []
+    # Sitemaps and news sitemaps
+    for url in selector.xpath('/urlset/url'):
+        date = url.xpath('news/publication_date/text()').get() or url.xpath('lastmod/text()').get()
+        entries.append((url.xpath('loc/text()').get('').strip(), parse_date(date)))
+    # RSS
+    for item in selector.xpath('//channel/item'):
+        entries.append((item.xpath('link/text()').get('').strip(),
+                        parse_date(item.xpath('pubDate/text()').get())))
+    # Atom
+    for entry in selector.xpath('/feed/entry'):
+        link = entry.xpath('link[@rel="alternate"]/@href').get() or entry.xpath('link/@href').get('')
+        date = entry.xpath('published/text()').get() or entry.xpath('updated/text()').get()
+        entries.append((link.strip(), parse_date(date)))
+
+    return [e for e in entries if e[0]], [s for s in sitemaps if s[0]]
@@ -0,0 +1,371 @@
+# Rotating, compressed JSONL storage for scraped items.
+#
+# Items are appended to gzip-compressed JSONL segments that are rotated by
+# size and by UTC day. A segment is written under a .part name and only renamed
+# and listed in manifest.json once it is complete, so a crash never leaves a
+# half-written file where readers look. Readers stream segments one line at a
+# time and can remember, in a checkpoint file, the last segment they consumed.
+#
+# iter_articles() also streams `scrapy crawl -o` exports, JSON arrays or
+# JSONL, plain or gzip/zstd-compressed, without loading them whole.
+
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # Only needed to read .zst exports
+    zstandard = None
+
+from .feeds import parse_date
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+SEGMENT_RE = re.compile(r'^segment-(\d+)\.jsonl\.gz(\.part)?$')
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+_VALUE_END = re.compile(r'[\s,\]]')
+
+
+def segment_name(seq):
+    return f'segment-{seq:06d}.jsonl.gz'
+
+
+def _write_json(path, data):
+    """Replaces a JSON file atomically."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_manifest(directory):
+    """Returns the manifest of a feed directory, empty if it has none yet."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'segments': []}
+
+
+def read_checkpoint(path):
+    """Returns the last segment number recorded in a checkpoint file, or 0."""
+    try:
+        with open(path) as f:
+            return json.load(f)['segment']
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, seq):
+    _write_json(path, {'segment': seq,
+                       'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds')})
+
+
+def iter_segments(directory, after=0):
+    """Yields manifest entries of the complete segments numbered above `after`."""
+    for segment in load_manifest(directory)['segments']:
+        if segment['seq'] > after:
+            yield segment
+
+
+def iter_items(directory, after=0, segments=None):
+    """Streams the items of complete segments numbered above `after`."""
+    if segments is None:
+        segments = iter_segments(directory, after)
+    for segment in segments:
+        with gzip.open(os.path.join(directory, segment['name']), 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def open_text(path):
+    """Opens a file as UTF-8 text, decompressing gzip or zstd by magic number."""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic[:2] == b'\x1f\x8b':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError(f'Reading {path} requires the zstandard package')
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yields the elements of a JSON array read incrementally from a text file."""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size)
+    pos = len(buf) - len(buf.lstrip())
+    if buf[pos:pos + 1] != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+    eof = False
+    while True:
+        # Skip separators, reading more input whenever the buffer runs dry
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError('Unterminated JSON array')
+            more = f.read(chunk_size)
+            eof = not more
+            buf, pos = more, 0
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+            # A number cut off by the end of the buffer can still decode
+            # ("12" of "123", "1" of "1.5"), so only trust a value once the
+            # separator after it has been read
+            truncated = not eof and not _VALUE_END.search(buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            truncated = True
+        if truncated:
+            more = f.read(chunk_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield value
+        pos = end
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_records(f):
+    """Yields the objects of a JSON array or JSONL text file."""
+    first = f.read(1)
+    while first.isspace():
+        first = f.read(1)
+    if first == '[':
+        yield from iter_json_array(_Prepend(first, f))
+        return
+    for line in _Prepend(first, f):
+        if line.strip():
+            yield json.loads(line)
+
+
+class _Prepend:
+    """Text file wrapper putting back characters already read."""
+
+    def __init__(self, head, f):
+        self.head = head
+        self.f = f
+
+    def read(self, size=-1):
+        head, self.head = self.head, ''
+        if size < 0:
+            return head + self.f.read()
+        return head + self.f.read(max(size - len(head), 0))
+
+    def __iter__(self):
+        head, self.head = self.head, ''
+        for line in self.f:
+            yield head + line
+            head = ''
+        if head:
+            yield head
+
+
+def select(records, fields=None, since=None, keep_undated=True):
+    """Filters records by publication date and projects them to some fields.
+
+    Args:
+        fields: Keys to keep, or None for all
+        since: Aware datetime; drop records published before it
+        keep_undated: Keep records without a parseable date when filtering
+    """
+    for record in records:
+        if since is not None:
+            published = parse_date(record.get('publication_date'))
+            if published is None and not keep_undated:
+                continue
+            if published is not None and published < since:
+                continue
+        if fields is not None:
+            record = {field: record.get(field) for field in fields}
+        yield record
+
+
+def _recent_segments(segments, since):
+    """Skips segments whose newest article predates the cutoff."""
+    for segment in segments:
+        last = parse_date(segment.get('last_published'))
+        if since is None or last is None or last >= since:
+            yield segment
+
+
+def iter_articles(source, fields=None, since=None, keep_undated=True):
+    """Streams articles from a feed directory or an exported file.
+
+    Files may be JSON arrays or JSONL, optionally gzip or zstd compressed;
+    see select() for the filtering arguments.
+    """
+    if os.path.isdir(source):
+        records = iter_items(source, segments=_recent_segments(iter_segments(source), since))
+        yield from select(records, fields, since, keep_undated)
+        return
+    with open_text(source) as f:
+        yield from select(iter_records(f), fields, since, keep_undated)
+
+
+class FeedReader:
+    """Reads the segments added since a checkpoint.
+
+    The set of segments is fixed when the reader is created, so segments
+    sealed while it is being read are left for the next run. Call commit()
+    once the items have been processed to advance the checkpoint.
+    """
+
+    def __init__(self, directory, checkpoint_path=None):
+        self.directory = directory
+        self.checkpoint_path = checkpoint_path
+        after = read_checkpoint(checkpoint_path) if checkpoint_path else 0
+        self.segments = list(iter_segments(directory, after))
+
+    def __iter__(self):
+        return iter_items(self.directory, segments=self.segments)
+
+    def items(self, fields=None, since=None, keep_undated=True):
+        """Streams the items, projected and filtered as in select()."""
+        segments = _recent_segments(self.segments, since)
+        return select(iter_items(self.directory, segments=segments), fields, since, keep_undated)
+
+    def commit(self):
+        if self.checkpoint_path and self.segments:
+            write_checkpoint(self.checkpoint_path, self.segments[-1]['seq'])
+
+
+class FeedWriter:
+    """Appends items to rotating gzip JSONL segments.
+
+    Args:
+        directory: Where segments and the manifest are kept
+        max_bytes: Rotate once a segment holds this many uncompressed bytes
+        rotate_daily: Also rotate when the UTC day changes
+        compresslevel: gzip compression level
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, rotate_daily=True,
+                 compresslevel=6, clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compresslevel = compresslevel
+        self.clock = clock
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = load_manifest(directory)
+        self._recover()
+        self.seq = max((s['seq'] for s in self.manifest['segments']), default=0)
+        self.file = None
+
+    def _path(self, seq, part=False):
+        return os.path.join(self.directory, segment_name(seq) + ('.part' if part else ''))
+
+    def _recover(self):
+        """Seals segments left open by a crash, keeping their complete lines."""
+        for name in sorted(os.listdir(self.directory)):
+            match = SEGMENT_RE.match(name)
+            if not match or not match.group(2):
+                continue
+            seq = int(match.group(1))
+            part = os.path.join(self.directory, name)
+            items = []
+            try:
+                with gzip.open(part, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        items.append(json.loads(line))
+            except (EOFError, OSError, zlib.error, ValueError):
+                pass  # The tail was cut off mid-write
+            if items:
+                tmp = part + '.recover'
+                with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=self.compresslevel) as f:
+                    for item in items:
+                        f.write(json.dumps(item, ensure_ascii=False) + '\n')
+                os.replace(tmp, self._path(seq))
+                self._add_segment(seq, items=len(items),
+                                  first_published=_min_date(items), last_published=_max_date(items))
+                logger.warning('Recovered %d items from unfinished segment %s', len(items), name)
+            os.remove(part)
+
+    def _day(self):
+        return datetime.fromtimestamp(self.clock(), timezone.utc).date().isoformat()
+
+    def _open(self):
+        self.seq += 1
+        self.file = gzip.open(self._path(self.seq, part=True), 'wb',
+                              compresslevel=self.compresslevel)
+        self.day = self._day()
+        self.bytes = 0
+        self.items = 0
+        self.first_published = None
+        self.last_published = None
+
+    def write(self, item):
+        line = (json.dumps(item, ensure_ascii=False) + '\n').encode('utf-8')
+        if self.file is not None and self.items and (
+                self.bytes + len(line) > self.max_bytes
+                or (self.rotate_daily and self._day() != self.day)):
+            self.rotate()
+        if self.file is None:
+            self._open()
+        self.file.write(line)
+        self.bytes += len(line)
+        self.items += 1
+        published = item.get('publication_date')
+        if published:
+            if self.first_published is None or published < self.first_published:
+                self.first_published = published
+            if self.last_published is None or published > self.last_published:
+                self.last_published = published
+
+    def rotate(self):
+        """Seals the current segment, making it visible to readers."""
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        if not self.items:
+            os.remove(self._path(self.seq, part=True))
+            self.seq -= 1
+            return
+        os.replace(self._path(self.seq, part=True), self._path(self.seq))
+        self._add_segment(self.seq, items=self.items, first_published=self.first_published,
+                          last_published=self.last_published)
+
+    def _add_segment(self, seq, items, first_published, last_published):
+        self.manifest['segments'].append({
+            'seq': seq,
+            'name': segment_name(seq),
+            'items': items,
+            'bytes': os.path.getsize(self._path(seq)),
+            'first_published': first_published,
+            'last_published': last_published,
+            'sealed_at': datetime.fromtimestamp(self.clock(), timezone.utc).isoformat(timespec='seconds'),
+        })
+        self.manifest['segments'].sort(key=lambda s: s['seq'])
+        _write_json(os.path.join(self.directory, MANIFEST), self.manifest)
+
+    def close(self):
+        self.rotate()
+
+
+def _min_date(items):
+    return min((i['publication_date'] for i in items if i.get('publication_date')), default=None)
+
+
+def _max_date(items):
+    return max((i['publication_date'] for i in items if i.get('publication_date')), default=None)
@@ -0,0 +1,201 @@
+# Recorded pages for offline benchmarks.
+#
+# Fixtures are stored per site as gzip JSONL (one line per page: url, status,
+# content type and body) in bench_fixtures/. They are served by a local HTTP
+# server, and FixtureRoutingMiddleware sends each request the spider makes to
+# that server while keeping the original URL on the response, so the real
+# spider, extraction rules and pipelines run unchanged without the network.
+# Sites without recordings get generated pages matching their selectors.
+
+import gzip
+import json
+import logging
+import os
+import random
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urljoin, urlparse
+
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+
+from .extraction import ExtractionEngine
+
+logger = logging.getLogger(__name__)
+
+
+def fixture_path(directory, domain):
+    return os.path.join(directory, f'{domain}.jsonl.gz')
+
+
+def load_fixtures(directory, sites):
+    """Returns ({url: (status, content type, body)}, domains with recordings)."""
+    pages = {}
+    recorded = []
+    for domain in sites:
+        path = fixture_path(directory, domain)
+        if not os.path.exists(path):
+            continue
+        recorded.append(domain)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                page = json.loads(line)
+                pages[page['url']] = (page['status'], page['content_type'],
+                                      page['body'].encode('utf-8'))
+    return pages, recorded
+
+
+def _fetch(url, user_agent):
+    request = urllib.request.Request(url, headers={'User-Agent': user_agent})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return (response.status, response.headers.get('Content-Type', 'text/html'),
+                response.read(), response.geturl())
+
+
+def record_fixtures(directory, sites, user_agent, articles_per_site=20):
+    """Saves each site's start page and its first articles as fixtures.
+
+    Pages are requested with user_agent, the crawler's USER_AGENT setting, so
+    sites see the recording as the crawler they already know.
+    """
+    os.makedirs(directory, exist_ok=True)
+    engine = ExtractionEngine(sites)
+    for domain, site in sites.items():
+        url = site['start_url']
+        try:
+            status, content_type, body, final_url = _fetch(url, user_agent)
+        except OSError as e:
+            logger.warning('Could not record %s: %s', url, e)
+            continue
+        pages = [(url, status, content_type, body)]
+        response = HtmlResponse(final_url, body=body, headers={'Content-Type': content_type})
+        links, _ = engine.extract_links(response, engine.rules_for(final_url))
+        for link in links[:articles_per_site]:
+            link = urljoin(final_url, link)
+            try:
+                pages.append((link,) + _fetch(link, user_agent)[:3])
+            except OSError as e:
+                logger.warning('Could not record %s: %s', link, e)
+        with gzip.open(fixture_path(directory, domain), 'wt', encoding='utf-8') as f:
+            for page_url, page_status, page_type, page_body in pages:
+                f.write(json.dumps({'url': page_url, 'status': page_status,
+                                    'content_type': page_type,
+                                    'body': page_body.decode('utf-8', errors='replace')}) + '\n')
+        logger.info('Recorded %d pages of %s', len(pages), domain)
+
+
+WORDS = ('senior living operators occupancy memory care assisted residents staffing '
+         'development capital acquisition community wellness technology rates portfolio '
+         'investment demand independent housing market construction pipeline').split()
+
+WORDPRESS_LISTING = '''<html><head><title>{site}</title></head><body>
+<main>{articles}</main>{next_page}</body></html>'''
+WORDPRESS_ENTRY = '''<article class="post type-post"><h2 class="entry-title">
+<a href="{url}">{title}</a></h2><div class="excerpt"><p>{excerpt}</p></div></article>'''
+WORDPRESS_ARTICLE = '''<html><head><title>{title} - {site}</title>
+<meta property="og:title" content="{title}">
+<meta property="article:published_time" content="{date}"></head><body>
+<article class="post"><h1 class="entry-title">{title}</h1>
+<div class="byline"><span class="author"><a href="/author/x">{author}</a></span>
+<time class="entry-date" datetime="{date}">{date}</time></div>
+<div class="entry-content">{paragraphs}</div></article></body></html>'''
+
+MCKNIGHTS_LISTING = '''<html><head><title>{site}</title></head><body>
+{articles}{next_page}</body></html>'''
+MCKNIGHTS_ENTRY = '''<div class="article-preview"><h2><a href="{url}">{title}</a></h2>
+<p>{excerpt}</p></div>'''
+MCKNIGHTS_ARTICLE = '''<html><head><title>{title}</title></head><body>
+<h1>{title}</h1><div class="article-meta"><a href="/author/x">{author}</a>
+<time datetime="{date}">{date}</time></div>
+<div class="article-content">{paragraphs}</div></body></html>'''
+
+TEMPLATES = {
+    'mcknightsseniorliving.com': (MCKNIGHTS_LISTING, MCKNIGHTS_ENTRY, MCKNIGHTS_ARTICLE),
+}
+DEFAULT_TEMPLATES = (WORDPRESS_LISTING, WORDPRESS_ENTRY, WORDPRESS_ARTICLE)
+
+
+def synthetic_fixtures(sites, articles_per_page=20, pages=3, paragraphs=12, seed=1):
+    """Generates listing pages with pagination and articles for each site."""
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+    fixtures = {}
+    for domain, site in sites.items():
+        listing, entry, article = TEMPLATES.get(domain, DEFAULT_TEMPLATES)
+        start = site['start_url']
+        base = f'{urlparse(start).scheme}://{urlparse(start).netloc}'
+        for page in range(1, pages + 1):
+            url = start if page == 1 else f'{base}/page/{page}/'
+            entries = []
+            for n in range(articles_per_page):
+                article_url = f'{base}/2026/10/{page:02d}/story-{page}-{n}/'
+                title = sentence(8)
+                date = f'2026-10-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:15:00-05:00'
+                entries.append(entry.format(url=article_url, title=title, excerpt=sentence(30)))
+                body = article.format(
+                    site=domain, title=title, author=sentence(2), date=date,
+                    paragraphs=''.join(f'<p>{sentence(60)}.</p>' for _ in range(paragraphs)))
+                fixtures[article_url] = (200, 'text/html; charset=utf-8', body.encode('utf-8'))
+            next_page = (f'<a class="next page-numbers" rel="next" href="{base}/page/{page + 1}/">Next</a>'
+                         if page < pages else '')
+            body = listing.format(site=domain, articles=''.join(entries), next_page=next_page)
+            fixtures[url] = (200, 'text/html; charset=utf-8', body.encode('utf-8'))
+    return fixtures
+
+
+def make_server(pages, port=0, host='127.0.0.1'):
+    """HTTP server answering /fetch?url=<original URL> from the fixtures."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = parse_qs(urlparse(self.path).query).get('url', [''])[0]
+            page = pages.get(url)
+            if page is None:
+                self.send_error(404)
+                return
+            status, content_type, body = page
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+class FixtureRoutingMiddleware:
+    """Downloader middleware sending every request to the fixture server.
+
+    Enabled by setting FIXTURE_SERVER_URL. The spider still sees the
+    original URL on each response.
+    """
+
+    def __init__(self, server_url):
+        self.server_url = server_url.rstrip('/')
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        server_url = crawler.settings.get('FIXTURE_SERVER_URL')
+        if not server_url:
+            raise NotConfigured
+        return cls(server_url)
+
+    def process_request(self, request, spider):
+        if 'fixture_url' in request.meta:
+            return None
+        # dont_filter also exempts the local URL from the offsite check
+        return request.replace(url=f'{self.server_url}/fetch?url={quote(request.url, safe="")}',
+                               meta=dict(request.meta, fixture_url=request.url),
+                               dont_filter=True)
+
+    def process_response(self, request, response, spider):
+        url = request.meta.get('fixture_url')
+        if url is None:
+            return response
+        return response.replace(url=url)
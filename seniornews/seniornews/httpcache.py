@@ -0,0 +1,170 @@
+# Packed HTTP cache storage.
+#
+# Scrapy's FilesystemCacheStorage writes a directory of several files per
+# response. This storage appends zlib-compressed response bodies to a few large
+# segment files instead, keyed by a hash of the body so identical pages are
+# stored once, and keeps every request's status, headers and body location in
+# a single SQLite index. Expiry can be set per domain, and HTTPCACHE_OFFLINE
+# serves whatever is cached regardless of age for replaying a past crawl.
+#
+# See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#writing-your-own-storage-backend
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from urllib.parse import urlparse
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_domain ON responses (domain, stored_at);
+"""
+
+
+def _encode_headers(headers):
+    return json.dumps({key.decode('latin-1'): [v.decode('latin-1') for v in values]
+                       for key, values in headers.items()})
+
+
+def _decode_headers(text):
+    return Headers({key.encode('latin-1'): [v.encode('latin-1') for v in values]
+                    for key, values in json.loads(text).items()})
+
+
+class PackedCacheStorage:
+    """HTTPCACHE_STORAGE backend keeping compressed bodies in segment packs.
+
+    Settings:
+        HTTPCACHE_DIR: Cache directory; each spider gets a subdirectory
+        HTTPCACHE_EXPIRATION_SECS: Default expiry, 0 to never expire
+        HTTPCACHE_DOMAIN_EXPIRATION_SECS: {domain: seconds} overrides, matched
+            against the request host and its parent domains
+        HTTPCACHE_OFFLINE: Ignore expiry, for replaying a cached crawl (use
+            with HTTPCACHE_IGNORE_MISSING to never touch the network)
+        HTTPCACHE_PACK_SEGMENT_BYTES: Start a new segment past this size
+        HTTPCACHE_PACK_COMPRESSLEVEL: zlib compression level
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.domain_expiration = settings.getdict('HTTPCACHE_DOMAIN_EXPIRATION_SECS')
+        self.offline = settings.getbool('HTTPCACHE_OFFLINE')
+        self.segment_bytes = settings.getint('HTTPCACHE_PACK_SEGMENT_BYTES', 256 * 1024 * 1024)
+        self.compresslevel = settings.getint('HTTPCACHE_PACK_COMPRESSLEVEL', 6)
+        self.conn = None
+        self._files = {}
+        self._expiry = {}
+        self._pending = 0
+
+    def open_spider(self, spider):
+        self.path = os.path.join(self.cachedir, spider.name)
+        os.makedirs(self.path, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.path, 'index.db'))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.segment = self.conn.execute('SELECT MAX(segment) FROM bodies').fetchone()[0] or 1
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        logger.debug('Using packed cache storage in %(path)s', {'path': self.path},
+                     extra={'spider': spider})
+
+    def close_spider(self, spider):
+        self.conn.commit()
+        self.conn.close()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _segment_file(self, segment):
+        f = self._files.get(segment)
+        if f is None:
+            f = self._files[segment] = open(
+                os.path.join(self.path, f'segment-{segment:06d}.pack'), 'a+b')
+        return f
+
+    def expiration_for(self, domain):
+        """Expiry in seconds for a domain or its closest configured parent."""
+        try:
+            return self._expiry[domain]
+        except KeyError:
+            pass
+        labels = domain.split('.')
+        expiry = self.expiration_secs
+        for i in range(len(labels)):
+            parent = '.'.join(labels[i:])
+            if parent in self.domain_expiration:
+                expiry = int(self.domain_expiration[parent])
+                break
+        self._expiry[domain] = expiry
+        return expiry
+
+    def retrieve_response(self, spider, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+        row = self.conn.execute(
+            'SELECT r.url, r.domain, r.status, r.headers, r.stored_at, b.segment, b.offset, b.length '
+            'FROM responses r JOIN bodies b ON b.hash = r.body_hash WHERE r.fingerprint = ?',
+            (key,)).fetchone()
+        if row is None:
+            return None  # not cached
+        url, domain, status, headers, stored_at, segment, offset, length = row
+        expiry = self.expiration_for(domain)
+        if not self.offline and 0 < expiry < time.time() - stored_at:
+            return None  # expired
+
+        f = self._segment_file(segment)
+        f.flush()
+        body = zlib.decompress(os.pread(f.fileno(), length, offset))
+        headers = _decode_headers(headers)
+        request.meta['cache_timestamp'] = stored_at
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        key = self._fingerprinter.fingerprint(request).hex()
+        body_hash = hashlib.sha1(response.body).hexdigest()
+        if self.conn.execute('SELECT 1 FROM bodies WHERE hash = ?', (body_hash,)).fetchone() is None:
+            data = zlib.compress(response.body, self.compresslevel)
+            f = self._segment_file(self.segment)
+            f.seek(0, os.SEEK_END)
+            if f.tell() and f.tell() + len(data) > self.segment_bytes:
+                self.segment += 1
+                f = self._segment_file(self.segment)
+                f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(data)
+            self.conn.execute('INSERT INTO bodies VALUES (?, ?, ?, ?, ?)',
+                              (body_hash, self.segment, offset, len(data), len(response.body)))
+        self.conn.execute(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, response.url, urlparse(response.url).hostname or '', response.status,
+             _encode_headers(response.headers), body_hash, time.time()))
+        # Commit in batches; an interrupted crawl only loses the latest entries
+        self._pending += 1
+        if self._pending >= 100:
+            self._segment_file(self.segment).flush()
+            self.conn.commit()
+            self._pending = 0
@@ -0,0 +1,283 @@
+# Crawl instrumentation shared by the spider and downloader middlewares.
+#
+# Collects, per domain: download latency histograms, bytes on the wire,
+# responses by status, download errors, time spent in spider callbacks and
+# items yielded, plus item pipeline time and DropItem reasons. The totals are
+# written to a JSON report when the spider closes and can be polled live
+# from a small HTTP endpoint while the crawl runs.
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from scrapy import signals
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, float('inf'))
+
+_VARIABLE_PARTS = re.compile(r'\S+://\S+|\'[^\']*\'|"[^"]*"|\d+')
+
+
+def domain_of(url):
+    host = urlparse(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def drop_reason(exception):
+    """Groups DropItem messages by stripping URLs, quoted values and numbers."""
+    return ' '.join(_VARIABLE_PARTS.sub('*', str(exception)).split()) or type(exception).__name__
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self.max if bound == float('inf') else bound
+        return None
+
+    def to_dict(self):
+        return {
+            'count': self.total,
+            'mean': self.sum / self.total if self.total else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'buckets': {('+Inf' if b == float('inf') else str(b)): c
+                        for b, c in zip(self.bounds, self.counts)},
+        }
+
+
+class DomainMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.requests = 0
+        self.cache_hits = 0
+        self.bytes = 0
+        self.statuses = {}
+        self.errors = {}
+        self.parse_seconds = 0.0
+        self.responses_parsed = 0
+        self.items = 0
+        self.requests_yielded = 0
+        self.dropped = {}
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'bytes': self.bytes,
+            'statuses': dict(sorted(self.statuses.items())),
+            'errors': self.errors,
+            'latency': self.latency.to_dict(),
+            'parse_seconds': round(self.parse_seconds, 4),
+            'parse_ms_per_response': (round(1000 * self.parse_seconds / self.responses_parsed, 2)
+                                      if self.responses_parsed else None),
+            'items': self.items,
+            'requests_yielded': self.requests_yielded,
+            'dropped': self.dropped,
+        }
+
+
+class CrawlMetrics:
+    """Metrics of one crawl, shared by the middlewares of the crawler.
+
+    Use CrawlMetrics.for_crawler(crawler) to get the crawler's instance; the
+    first call connects it to the crawler's signals, so the live endpoint is
+    served on METRICS_PORT (if set) while the spider runs and the report is
+    written to METRICS_REPORT when it closes.
+    """
+
+    def __init__(self, report_path=None, port=None, clock=time.time):
+        self.report_path = report_path
+        self.port = port
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.domains = {}
+        self.item_seconds = {}
+        self.pipeline_seconds = 0.0
+        self.pipeline_items = 0
+        self.dropped = {}
+        self._pending = {}
+        self.started = None
+        self.finished = None
+        self.server = None
+
+    @classmethod
+    def for_crawler(cls, crawler):
+        metrics = getattr(crawler, 'seniornews_metrics', None)
+        if metrics is None:
+            settings = crawler.settings
+            metrics = cls(settings.get('METRICS_REPORT'), settings.getint('METRICS_PORT') or None)
+            crawler.signals.connect(metrics.spider_opened, signal=signals.spider_opened)
+            crawler.signals.connect(metrics.spider_closed, signal=signals.spider_closed)
+            crawler.signals.connect(metrics.item_scraped, signal=signals.item_scraped)
+            crawler.signals.connect(metrics.item_dropped, signal=signals.item_dropped)
+            crawler.seniornews_metrics = metrics
+        return metrics
+
+    def domain(self, url):
+        name = domain_of(url)
+        metrics = self.domains.get(name)
+        if metrics is None:
+            metrics = self.domains[name] = DomainMetrics()
+        return metrics
+
+    # Downloader
+
+    def record_response(self, request, response):
+        with self.lock:
+            metrics = self.domain(request.url)
+            # HTTP cache hits pass through every downloader middleware too,
+            # but cost no request, bytes or latency
+            if 'cached' in response.flags:
+                metrics.cache_hits += 1
+                return
+            metrics.requests += 1
+            metrics.bytes += len(response.body)
+            metrics.statuses[response.status] = metrics.statuses.get(response.status, 0) + 1
+            latency = request.meta.get('download_latency')
+            if latency is not None:
+                metrics.latency.observe(latency)
+
+    def record_error(self, request, exception):
+        with self.lock:
+            metrics = self.domain(request.url)
+            metrics.requests += 1
+            name = type(exception).__name__
+            metrics.errors[name] = metrics.errors.get(name, 0) + 1
+
+    # Spider
+
+    def record_parse(self, response, seconds, items, requests):
+        with self.lock:
+            metrics = self.domain(response.url)
+            metrics.parse_seconds += seconds
+            metrics.responses_parsed += 1
+            metrics.items += items
+            metrics.requests_yielded += requests
+
+    def item_yielded(self, item):
+        now = self.clock()
+        with self.lock:
+            second = int(now)
+            self.item_seconds[second] = self.item_seconds.get(second, 0) + 1
+            self._pending[id(item)] = now
+
+    # Signals
+
+    def item_scraped(self, item, response, spider):
+        started = self._pending.pop(id(item), None)
+        if started is not None:
+            with self.lock:
+                self.pipeline_seconds += self.clock() - started
+                self.pipeline_items += 1
+
+    def item_dropped(self, item, response, exception, spider):
+        started = self._pending.pop(id(item), None)
+        reason = drop_reason(exception)
+        with self.lock:
+            if started is not None:
+                self.pipeline_seconds += self.clock() - started
+                self.pipeline_items += 1
+            self.dropped[reason] = self.dropped.get(reason, 0) + 1
+            if response is not None:
+                dropped = self.domain(response.url).dropped
+                dropped[reason] = dropped.get(reason, 0) + 1
+
+    def spider_opened(self, spider):
+        self.started = self.clock()
+        if self.port:
+            self.server = MetricsServer(self, self.port)
+            self.server.start()
+            spider.logger.info('Serving live crawl metrics on http://127.0.0.1:%d/metrics',
+                               self.server.port)
+
+    def spider_closed(self, spider, reason):
+        self.finished = self.clock()
+        if self.server is not None:
+            self.server.stop()
+        if self.report_path:
+            started = datetime.fromtimestamp(self.started or self.finished, timezone.utc)
+            path = self.report_path.replace('%(time)s', started.strftime('%Y%m%dT%H%M%S'))
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(dict(self.report(), spider=spider.name, finish_reason=reason), f, indent=2)
+            spider.logger.info('Wrote crawl metrics report to %s', path)
+
+    def report(self):
+        with self.lock:
+            end = self.finished or self.clock()
+            elapsed = end - self.started if self.started else 0
+            items = sum(self.item_seconds.values())
+            domains = {name: m.to_dict() for name, m in sorted(self.domains.items())}
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'requests': sum(m.requests for m in self.domains.values()),
+                'bytes': sum(m.bytes for m in self.domains.values()),
+                'items': items,
+                'items_per_second': round(items / elapsed, 3) if elapsed else None,
+                'peak_items_per_second': max(self.item_seconds.values(), default=0),
+                'pipeline_ms_per_item': (round(1000 * self.pipeline_seconds / self.pipeline_items, 3)
+                                         if self.pipeline_items else None),
+                'dropped': self.dropped,
+                'domains': domains,
+            }
+
+
+class MetricsServer:
+    """Serves CrawlMetrics.report() as JSON at /metrics from a daemon thread."""
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.report()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -3,101 +3,174 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import time
+from urllib.parse import urlparse
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
 
 # useful for handling different item types with a single interface
-from itemadapter import is_item, ItemAdapter
+from itemadapter import is_item
+
+from .crawlstate import CrawlState, content_hash
+from .metrics import CrawlMetrics
 
 
 class SeniornewsSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    """Spider middleware that times spider callbacks per domain and counts
+    the items and requests they yield. See metrics.py for the report."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
-
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+        if not crawler.settings.getbool("METRICS_ENABLED"):
+            raise NotConfigured
+        return cls(CrawlMetrics.for_crawler(crawler))
 
-        # Should return None or raise an exception.
-        return None
+    def _count(self, obj, counts):
+        if isinstance(obj, Request):
+            counts[1] += 1
+        elif is_item(obj):
+            counts[0] += 1
+            self.metrics.item_yielded(obj)
 
     def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+        # Only time spent inside the callback counts, not in later stages
+        counts = [0, 0]
+        elapsed = 0.0
+        result = iter(result)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    obj = next(result)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                self._count(obj, counts)
+                yield obj
+        finally:
+            self.metrics.record_parse(response, elapsed, *counts)
+
+    async def process_spider_output_async(self, response, result, spider):
+        counts = [0, 0]
+        elapsed = 0.0
+        result = result.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    obj = await result.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                self._count(obj, counts)
+                yield obj
+        finally:
+            self.metrics.record_parse(response, elapsed, *counts)
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+class SeniornewsDownloaderMiddleware:
+    """Downloader middleware that records per-domain latency, bytes on the
+    wire, responses by status and download errors.
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+    It sits next to the downloader so that bytes are measured before
+    decompression. Responses served by HttpCacheMiddleware still pass
+    through it; they are flagged 'cached' and only counted as cache hits.
+    """
 
-    def process_start_requests(self, start_requests, spider):
-        # Called with the start requests of the spider, and works
-        # similarly to the process_spider_output() method, except
-        # that it doesn’t have a response associated.
+    def __init__(self, metrics):
+        self.metrics = metrics
 
-        # Must return only requests (not items).
-        for r in start_requests:
-            yield r
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("METRICS_ENABLED"):
+            raise NotConfigured
+        return cls(CrawlMetrics.for_crawler(crawler))
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+    def process_response(self, request, response, spider):
+        self.metrics.record_response(request, response)
+        return response
 
+    def process_exception(self, request, exception, spider):
+        self.metrics.record_error(request, exception)
+        return None
 
-class SeniornewsDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+
+class CrawlStateMiddleware:
+    """Downloader middleware for incremental crawls.
+
+    Adds If-None-Match / If-Modified-Since headers for pages seen on earlier
+    crawls and flags responses whose content has not changed with
+    ``request.meta["crawlstate_unchanged"]`` so the spider can skip them.
+    """
+
+    def __init__(self, state):
+        self.state = state
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        settings = crawler.settings
+        if not settings.getbool("CRAWLSTATE_ENABLED"):
+            raise NotConfigured
+        state = CrawlState(settings.get("CRAWLSTATE_PATH", "crawlstate.db"),
+                           recheck_after=settings.getfloat("CRAWLSTATE_RECHECK_AFTER", 0))
+        s = cls(state)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
+    def _applies(self, request):
+        # robots.txt must always be fetched in full.
+        return (not request.meta.get("dont_crawlstate")
+                and urlparse(request.url).path != "/robots.txt")
+
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
+        if not self._applies(request):
+            return None
+        record = self.state.get(request.url)
+        if record is None:
+            return None
+        if record["etag"]:
+            request.headers.setdefault("If-None-Match", record["etag"])
+        if record["last_modified"]:
+            request.headers.setdefault("If-Modified-Since", record["last_modified"])
+        # Let 304 responses through to the spider instead of HttpErrorMiddleware.
+        allowed = request.meta.get("handle_httpstatus_list", [])
+        if 304 not in allowed:
+            request.meta["handle_httpstatus_list"] = list(allowed) + [304]
         return None
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
-
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if not self._applies(request):
+            return response
+        if response.status == 304:
+            self.state.touch(request.url)
+            request.meta["crawlstate_unchanged"] = True
+            spider.crawler.stats.inc_value("crawlstate/not_modified")
+        elif response.status == 200:
+            changed = self.state.update(
+                request.url,
+                _header(response, "ETag"),
+                _header(response, "Last-Modified"),
+                content_hash(response.body),
+            )
+            request.meta["crawlstate_unchanged"] = not changed
+            spider.crawler.stats.inc_value(
+                "crawlstate/changed" if changed else "crawlstate/unchanged")
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    def spider_opened(self, spider):
+        spider.crawl_state = self.state
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    def spider_closed(self, spider):
+        self.state.close()
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+
+def _header(response, name):
+    value = response.headers.get(name)
+    return value.decode("latin-1") if value else None
@@ -0,0 +1,228 @@
+# Near-duplicate detection for stories covered by several publishers.
+#
+# Titles are reduced to MinHash signatures over their significant words and
+# body leads over character shingles, and each signature is cut into LSH bands. Two texts land in the
+# same band bucket with high probability only if their Jaccard similarity is
+# high, so finding an article's near-duplicates takes a few dict lookups
+# instead of a comparison with every other article. Bucket hits are confirmed
+# on the similarity estimated from the full signatures.
+#
+# FeaturedIndex persists the signatures of stories already sent in a
+# newsletter, so later runs can drop new coverage of the same story.
+
+import json
+import os
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# Prime just above 2**32, so (a * h) stays below 2**64 for 32-bit a and h
+_PRIME = np.uint64(4294967311)
+
+INDEX_VERSION = 2
+
+# Fields compared between articles, as (characters per shingle or None for
+# words, characters read, similarity that counts as a duplicate, rows per LSH
+# band). Rewritten headlines keep their names and key words but little of
+# their wording, so titles are compared as word sets at a lower threshold,
+# with short bands to make pairs at that threshold candidates.
+FIELDS = {'title': (None, None, 0.4, 2), 'body': (5, 1000, 0.5, 4)}
+
+# Words that say nothing about which story a headline covers; the domain
+# terms appear in most headlines of this newsletter
+STOP_WORDS = ENGLISH_STOP_WORDS | {'senior', 'seniors', 'living', 'housing'}
+
+
+class MinHasher:
+    """MinHash signatures and LSH band keys for short texts.
+
+    Texts sharing any band of a field's signature are candidates. A band of
+    r rows out of n permutations makes candidates from a Jaccard similarity
+    of about (r / n) ** (1 / r): 0.13 for titles and 0.42 for bodies with
+    the default 128 permutations.
+
+    Args:
+        num_perm: Hash functions per signature, a multiple of every field's
+            rows per band
+        seed: Seed for the hash functions, fixed so persisted signatures stay
+            comparable
+    """
+
+    def __init__(self, num_perm=128, seed=1):
+        if any(num_perm % rows for _, _, _, rows in FIELDS.values()):
+            raise ValueError('num_perm must be a multiple of the rows per band')
+        self.num_perm = num_perm
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 32, num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64)[:, None]
+
+    def shingles(self, text, k):
+        """CRC32 hashes of the k-character shingles of normalized text, or of
+        its significant words if k is None."""
+        words = re.findall(r'\w+', text.lower())
+        if k is None:
+            # Crude plural folding, so "gains" and "gain" count as one word
+            grams = {word[:-1] if len(word) > 3 and word.endswith('s')
+                     and not word.endswith('ss') else word
+                     for word in words if word not in STOP_WORDS}
+        else:
+            text = ' '.join(words)
+            grams = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams),
+                           dtype=np.uint64, count=len(grams))
+
+    def signature(self, text, k=5):
+        """MinHash signature of a text's shingles, or None if it has none."""
+        if not text or not re.search(r'\w', text):
+            return None
+        hashes = self.shingles(text, k)[None, :]
+        if not hashes.size:
+            return None
+        return (((self.a * hashes) % _PRIME + self.b) % _PRIME).min(axis=1)
+
+    def band_keys(self, field, signature):
+        """One bucket key per band, prefixed with the field and band number."""
+        rows = FIELDS[field][3]
+        return [f'{field}{i}:{zlib.crc32(signature[i * rows:(i + 1) * rows].tobytes()):08x}'
+                for i in range(len(signature) // rows)]
+
+    def signatures(self, article):
+        """{field: signature} for the fields of an article that have text."""
+        result = {}
+        for field, (k, max_chars, _, _) in FIELDS.items():
+            signature = self.signature((article.get(field) or '')[:max_chars], k)
+            if signature is not None:
+                result[field] = signature
+        return result
+
+
+def similarity(a, b):
+    """Jaccard similarity estimated from two MinHash signatures."""
+    return float(np.mean(a == b))
+
+
+class LSHIndex:
+    """Entries findable by near-duplicate title or body.
+
+    Args:
+        hasher: MinHasher used for every signature in the index
+        threshold: Estimated Jaccard similarity that counts as a duplicate,
+            by default each field's threshold in FIELDS
+    """
+
+    def __init__(self, hasher=None, threshold=None):
+        self.hasher = hasher or MinHasher()
+        self.threshold = threshold
+        self.entries = []
+        self.buckets = {}
+
+    def add(self, key, signatures):
+        index = len(self.entries)
+        self.entries.append((key, signatures))
+        for field, signature in signatures.items():
+            for band in self.hasher.band_keys(field, signature):
+                self.buckets.setdefault(band, []).append(index)
+
+    def match(self, signatures):
+        """Key of an entry the signatures duplicate, or None."""
+        for field, signature in signatures.items():
+            threshold = self.threshold if self.threshold is not None else FIELDS[field][2]
+            for band in self.hasher.band_keys(field, signature):
+                for index in self.buckets.get(band, ()):
+                    key, other = self.entries[index]
+                    if field in other and similarity(signature, other[field]) >= threshold:
+                        return key
+        return None
+
+
+def distinct(scored, top_n, hasher=None, threshold=None):
+    """The best-scoring article of each near-duplicate cluster, up to top_n.
+
+    Args:
+        scored: (score, article) pairs, highest score first
+
+    Returns:
+        list: (score, article) pairs of at most top_n distinct stories
+    """
+    index = LSHIndex(hasher, threshold)
+    picked = []
+    for score, article in scored:
+        if len(picked) == top_n:
+            break
+        signatures = index.hasher.signatures(article)
+        if index.match(signatures) is not None:
+            continue
+        index.add(len(picked), signatures)
+        picked.append((score, article))
+    return picked
+
+
+class FeaturedIndex(LSHIndex):
+    """Persisted index of stories already featured in a newsletter.
+
+    Args:
+        path: JSON file holding the featured stories
+        max_age_days: Stories featured longer ago than this are forgotten
+    """
+
+    def __init__(self, path, hasher=None, threshold=None, max_age_days=180):
+        super().__init__(hasher, threshold)
+        self.path = path
+        self.max_age_days = max_age_days
+        self.urls = set()
+        self.stories = []
+        for story in self._load():
+            self._add_story(story)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return []
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.max_age_days)
+        stories = [story for story in state['stories']
+                   if datetime.fromisoformat(story['featured_at']) >= cutoff]
+        if state.get('version') != INDEX_VERSION or state.get('num_perm') != self.hasher.num_perm:
+            # Signatures from another format; the titles are kept, so rebuild
+            # theirs rather than forget what was featured
+            for story in stories:
+                story['signatures'] = {field: signature.tolist() for field, signature
+                                       in self.hasher.signatures(story).items()}
+        return stories
+
+    def _add_story(self, story):
+        self.stories.append(story)
+        if story.get('url'):
+            self.urls.add(story['url'])
+        signatures = {field: np.array(values, dtype=np.uint64)
+                      for field, values in story['signatures'].items()}
+        self.add(story.get('url'), signatures)
+
+    def contains(self, article, signatures=None):
+        """Whether the article, or a near-duplicate of it, was featured."""
+        if article.get('url') in self.urls:
+            return True
+        if signatures is None:
+            signatures = self.hasher.signatures(article)
+        return self.match(signatures) is not None
+
+    def feature(self, article):
+        """Records an article as featured; call save() to persist it."""
+        self._add_story({
+            'url': article.get('url'),
+            'title': article.get('title'),
+            'featured_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'signatures': {field: signature.tolist() for field, signature
+                           in self.hasher.signatures(article).items()},
+        })
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'num_perm': self.hasher.num_perm,
+                       'stories': self.stories}, f)
+        os.replace(tmp, self.path)
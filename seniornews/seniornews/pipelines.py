@@ -6,11 +6,25 @@
 
 from datetime import datetime
 from itemadapter import ItemAdapter
-from scrapy.exceptions import DropItem
+from scrapy.exceptions import DropItem, NotConfigured
+
+from .dedup import SeenStore, canonical_url, title_fingerprint
+from .feedstore import FeedWriter
 
 
 class SeniorNewsCleaningPipeline:
-    """Pipeline for cleaning and validating senior news items."""
+    """Pipeline for cleaning and validating senior news items.
+
+    Args:
+        body_max_chars: Article text beyond this many characters is cut off
+    """
+
+    def __init__(self, body_max_chars=20000):
+        self.body_max_chars = body_max_chars
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.getint('BODY_MAX_CHARS', 20000))
     
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
@@ -35,10 +49,98 @@ class SeniorNewsCleaningPipeline:
             except (ValueError, AttributeError):
                 adapter['publication_date'] = None
         
-
+        # Collapse whitespace in the article text and bound its size
+        if adapter.get('body'):
+            adapter['body'] = ' '.join(adapter['body'].split())[:self.body_max_chars]
         
         # Validate URL
         if not adapter.get('url'):
             raise DropItem('Missing URL')
         
         return item
+
+
+class DedupPipeline:
+    """Pipeline that drops stories already seen under another URL or publisher.
+
+    Items are keyed by canonical URL and by normalized title fingerprint; an
+    item matching either key, in this crawl or an earlier one, is dropped.
+    """
+
+    def __init__(self, stats, directory, capacity, error_rate, max_generations):
+        self.stats = stats
+        self.directory = directory
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_generations = max_generations
+        self.seen = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('DEDUP_ENABLED'):
+            raise NotConfigured
+        return cls(crawler.stats,
+                   settings.get('DEDUP_DIR', 'dedup'),
+                   settings.getint('DEDUP_CAPACITY', 100000),
+                   settings.getfloat('DEDUP_ERROR_RATE', 0.001),
+                   settings.getint('DEDUP_MAX_GENERATIONS', 24))
+
+    def open_spider(self, spider):
+        self.seen = SeenStore(self.directory, self.capacity, self.error_rate,
+                              self.max_generations)
+
+    def close_spider(self, spider):
+        self.seen.close()
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        url_key = 'url:' + canonical_url(adapter['url'])
+        fingerprint = title_fingerprint(adapter.get('title'))
+        title_key = fingerprint and 'title:' + fingerprint
+
+        if url_key in self.seen:
+            self.stats.inc_value('dedup/skipped/url')
+            raise DropItem(f'Duplicate URL {adapter["url"]}')
+        if title_key and title_key in self.seen:
+            self.stats.inc_value('dedup/skipped/title')
+            raise DropItem(f'Duplicate title {adapter["title"]!r} at {adapter["url"]}')
+
+        self.seen.add(url_key)
+        if title_key:
+            self.seen.add(title_key)
+        self.stats.inc_value('dedup/kept')
+        return item
+
+
+class FeedStorePipeline:
+    """Pipeline that appends cleaned items to rotating compressed JSONL segments.
+
+    Runs after SeniorNewsCleaningPipeline. See feedstore.py for the layout
+    of the feed directory and how readers consume it.
+    """
+
+    def __init__(self, directory, max_bytes, rotate_daily):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('FEEDSTORE_ENABLED'):
+            raise NotConfigured
+        return cls(settings.get('FEEDSTORE_DIR', 'feed'),
+                   settings.getint('FEEDSTORE_MAX_BYTES', 64 * 1024 * 1024),
+                   settings.getbool('FEEDSTORE_ROTATE_DAILY', True))
+
+    def open_spider(self, spider):
+        self.writer = FeedWriter(self.directory, self.max_bytes, self.rotate_daily)
+
+    def close_spider(self, spider):
+        self.writer.close()
+
+    def process_item(self, item, spider):
+        self.writer.write(ItemAdapter(item).asdict())
+        return item
@@ -20,12 +20,14 @@ USER_AGENT = "SeniorNewsBot (+https://www.example.com)"
 ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+# High enough that every site's crawl profile can be busy at the same time
+CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
-# See also autothrottle settings and docs
-DOWNLOAD_DELAY = 2
+# Per-site delays come from CRAWL_PROFILES below; this is only the starting
+# delay for slots before the DomainThrottle extension tunes them
+DOWNLOAD_DELAY = 1
 # The download delay setting will honor only one of:
 #CONCURRENT_REQUESTS_PER_DOMAIN = 16
 #CONCURRENT_REQUESTS_PER_IP = 16
@@ -44,31 +46,96 @@ DOWNLOAD_DELAY = 2
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "seniornews.middlewares.SeniornewsSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "seniornews.middlewares.SeniornewsSpiderMiddleware": 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "seniornews.middlewares.SeniornewsDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "seniornews.middlewares.CrawlStateMiddleware": 560,
+    # Next to the downloader, so bytes are on-the-wire; cache hits are counted
+    # apart from requests
+    "seniornews.middlewares.SeniornewsDownloaderMiddleware": 950,
+}
+
+# Crawl instrumentation: per-domain latency, bytes, statuses, parse time,
+# items/sec and drop reasons, written as JSON to METRICS_REPORT at close
+# ("%(time)s" is replaced by the start time). Set METRICS_PORT to poll the
+# same numbers live from http://127.0.0.1:<port>/metrics during a crawl.
+METRICS_ENABLED = True
+METRICS_REPORT = "reports/crawl-%(time)s.json"
+#METRICS_PORT = 6081
+
+# Incremental crawling: remember each page's ETag, Last-Modified and content
+# hash between runs, send conditional requests and skip unchanged articles.
+CRAWLSTATE_ENABLED = True
+CRAWLSTATE_PATH = "crawlstate.db"
+# Articles seen within this many seconds are not requested again at all
+CRAWLSTATE_RECHECK_AFTER = 3 * 24 * 3600
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    "seniornews.throttle.DomainThrottle": 500,
+}
+
+# Per-domain crawl profiles used by DomainThrottle instead of one global pace.
+# Keys match a host or any parent domain; sites without an entry use
+# CRAWL_PROFILE_DEFAULT. Each profile sets:
+#   concurrency     most requests in flight at once
+#   min_delay       delay floor between requests, in seconds
+#   max_delay       delay ceiling, in seconds
+#   target_latency  concurrency is reduced while responses are slower than this
+DOMAIN_THROTTLE_ENABLED = True
+CRAWL_PROFILE_DEFAULT = {"concurrency": 2, "min_delay": 1.0, "max_delay": 30.0, "target_latency": 2.0}
+CRAWL_PROFILES = {
+    "seniorhousingnews.com": {"concurrency": 4, "min_delay": 0.5, "target_latency": 1.5},
+    "seniorlivingnews.com": {"concurrency": 2, "min_delay": 1.0, "target_latency": 2.0},
+    "seniorshousingbusiness.com": {"concurrency": 2, "min_delay": 1.0, "target_latency": 2.0},
+    "mcknightsseniorliving.com": {"concurrency": 4, "min_delay": 0.5, "target_latency": 1.5},
+    "argentum.org": {"concurrency": 1, "min_delay": 2.0, "target_latency": 3.0},
+}
+# Set by crawl_sharded.py for domains split across several worker processes:
+# {domain: number of workers}; each worker gets that share of the profile
+#DOMAIN_THROTTLE_SHARES = {}
+#DOMAIN_THROTTLE_DEBUG = False
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
     "seniornews.pipelines.SeniorNewsCleaningPipeline": 300,
+    "seniornews.pipelines.DedupPipeline": 400,
+    "seniornews.pipelines.FeedStorePipeline": 800,
 }
 
+# Article text kept per item for full-text relevance scoring; longer bodies
+# are truncated by the cleaning pipeline
+BODY_MAX_CHARS = 20000
+
+# Drop stories seen before under another URL (tracking params, www, AMP) or
+# syndicated under the same title. Seen keys are kept in Bloom filters in
+# DEDUP_DIR; each generation holds DEDUP_CAPACITY keys before it is spilled
+# to disk, and generations beyond DEDUP_MAX_GENERATIONS are forgotten.
+DEDUP_ENABLED = True
+DEDUP_DIR = "dedup"
+DEDUP_CAPACITY = 100000
+DEDUP_ERROR_RATE = 0.001
+DEDUP_MAX_GENERATIONS = 24
+
+# Append cleaned items to rotating gzip JSONL segments in FEEDSTORE_DIR,
+# which select_top_articles.py reads incrementally
+FEEDSTORE_ENABLED = True
+FEEDSTORE_DIR = "feed"
+# Rotate segments at this many uncompressed bytes, and at each new UTC day
+FEEDSTORE_MAX_BYTES = 64 * 1024 * 1024
+FEEDSTORE_ROTATE_DAILY = True
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
+# Disabled in favour of the per-domain DomainThrottle extension above
+AUTOTHROTTLE_ENABLED = False
 # The initial download delay
 #AUTOTHROTTLE_START_DELAY = 5
 # The maximum download delay to be set in case of high latencies
@@ -81,11 +148,24 @@ AUTOTHROTTLE_ENABLED = True
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# Responses are packed into compressed segment files with one SQLite index.
+# Off for scheduled crawls: a cached listing page would hide the articles
+# published since it was stored. Enable it for development crawls with
+# -s HTTPCACHE_ENABLED=1 (crawl_sharded.py --httpcache for workers). To replay
+# a cached crawl without any network access, run with
+#   -s HTTPCACHE_ENABLED=1 -s HTTPCACHE_OFFLINE=1 -s HTTPCACHE_IGNORE_MISSING=1 -s CRAWLSTATE_ENABLED=0
+# (and DEDUP_ENABLED=0 / FEEDSTORE_ENABLED=0 to keep the replay out of them)
+HTTPCACHE_ENABLED = False
+HTTPCACHE_EXPIRATION_SECS = 6 * 3600
+HTTPCACHE_DOMAIN_EXPIRATION_SECS = {
+    "argentum.org": 24 * 3600,
+}
+HTTPCACHE_DIR = "httpcache"
+# Not-modified and transient error responses would hide the cached page
+HTTPCACHE_IGNORE_HTTP_CODES = [304, 429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = "seniornews.httpcache.PackedCacheStorage"
+#HTTPCACHE_OFFLINE = False
+#HTTPCACHE_PACK_SEGMENT_BYTES = 256 * 1024 * 1024
 
 # Set settings whose default value is deprecated to a future-proof value
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
@@ -0,0 +1,101 @@
+# Planning and merging for multi-process crawls.
+#
+# A crawl is split into units: a whole site, or one hash shard of a site that
+# is too large for one process. Units are spread over worker processes, each
+# running the spider with its own crawl state, dedup filters, feed and cache
+# directories. Afterwards the workers' new feed segments are merged into the
+# main feed, deduplicated across workers and ordered by publication date.
+
+import os
+
+from .dedup import SeenStore, canonical_url, title_fingerprint
+from .feedstore import FeedReader, FeedWriter
+from .feeds import parse_date
+
+
+def plan_shards(domains, workers, split=None):
+    """Assigns crawl units to workers.
+
+    Args:
+        domains: Sites to crawl
+        workers: Number of worker processes
+        split: {domain: n} for sites to split into n URL-hash shards
+
+    Returns:
+        list: One {'domains': [...], 'shards': {domain: (i, n)}} per worker
+        that has anything to do
+    """
+    split = split or {}
+    units = []
+    for domain in domains:
+        count = min(int(split.get(domain, 1)), workers)
+        if count > 1:
+            units.extend((domain, (i, count)) for i in range(count))
+        else:
+            units.append((domain, None))
+
+    # Shards of one site go to distinct workers, which round-robin over
+    # shards-first ordering guarantees
+    units.sort(key=lambda unit: unit[1] is None)
+    plans = [{'domains': [], 'shards': {}} for _ in range(workers)]
+    for n, (domain, shard) in enumerate(units):
+        plan = plans[n % workers]
+        plan['domains'].append(domain)
+        if shard is not None:
+            plan['shards'][domain] = shard
+    return [plan for plan in plans if plan['domains']]
+
+
+def shard_shares(plans):
+    """Number of workers crawling each site, for DOMAIN_THROTTLE_SHARES."""
+    shares = {}
+    for plan in plans:
+        for domain in plan['shards']:
+            shares[domain] = shares.get(domain, 0) + 1
+    return shares
+
+
+def _date_key(item):
+    # Undated copies sort last, so a dated copy of the same story wins
+    date = parse_date(item.get('publication_date'))
+    return (date is None, date.timestamp() if date else 0)
+
+
+def merge_feeds(worker_dirs, feed_dir, dedup_dir, max_bytes=64 * 1024 * 1024):
+    """Merges the segments workers added since the last merge into one feed.
+
+    Items are deduplicated by canonical URL and title fingerprint against
+    each other and against everything merged before, then written in
+    publication date order with undated items last. Each worker's
+    checkpoint only advances after the merged segment is sealed.
+
+    Returns:
+        tuple: (items written, duplicates dropped)
+    """
+    readers = [FeedReader(d, os.path.join(d, 'merge-checkpoint.json'))
+               for d in worker_dirs if os.path.isdir(d)]
+    items = [item for reader in readers for item in reader]
+    items.sort(key=_date_key)
+
+    seen = SeenStore(dedup_dir)
+    writer = FeedWriter(feed_dir, max_bytes=max_bytes, rotate_daily=False)
+    written = dropped = 0
+    try:
+        for item in items:
+            keys = ['url:' + canonical_url(item['url'])]
+            fingerprint = title_fingerprint(item.get('title'))
+            if fingerprint:
+                keys.append('title:' + fingerprint)
+            if any(key in seen for key in keys):
+                dropped += 1
+                continue
+            for key in keys:
+                seen.add(key)
+            writer.write(item)
+            written += 1
+    finally:
+        writer.close()
+        seen.close()
+    for reader in readers:
+        reader.commit()
+    return written, dropped
@@ -0,0 +1,92 @@
+# Registry of the news sites the spider crawls.
+#
+# Each entry is keyed by the site's registered domain and says where to start
+# crawling, which feeds to try for discovery, and how to extract article links
+# from listing pages and fields from article pages. Adding a site only takes a
+# new entry here (plus a CRAWL_PROFILES entry if it needs its own pace).
+#
+# Selectors are CSS with Scrapy's ::text and ::attr() extensions. A field may
+# list several selectors; the first one that matches wins. Fields a site does
+# not list, or whose selectors all miss, fall back to GENERIC_FIELDS, which
+# read the OpenGraph and article meta tags most publishers emit.
+#
+# "fast": True extracts with compiled lxml XPath on the raw body, skipping
+# the Scrapy selector layer; use it for high-volume sites.
+
+GENERIC_FIELDS = {
+    'title': ['meta[property="og:title"]::attr(content)', 'h1::text', 'title::text'],
+    'author': ['meta[name="author"]::attr(content)',
+               'meta[property="article:author"]::attr(content)',
+               'a[rel="author"]::text'],
+    'publication_date': ['meta[property="article:published_time"]::attr(content)',
+                         'time::attr(datetime)'],
+    'body': ['article p ::text'],
+}
+
+SITES = {
+    'seniorhousingnews.com': {
+        'start_url': 'https://www.seniorhousingnews.com/',
+        'feeds': ['https://seniorhousingnews.com/feed/',
+                  'https://seniorhousingnews.com/sitemap.xml'],
+        'links': ['article.post h2.entry-title a::attr(href)'],
+        'next_page': ['a.next.page-numbers::attr(href)'],
+        'fields': {
+            'title': ['h1.entry-title::text'],
+            'author': ['span.author a::text'],
+            'publication_date': ['time.entry-date::attr(datetime)'],
+            'body': ['div.entry-content p ::text'],
+        },
+        'fast': True,
+    },
+    'seniorlivingnews.com': {
+        'start_url': 'https://www.seniorlivingnews.com/',
+        'feeds': ['https://www.seniorlivingnews.com/feed/',
+                  'https://www.seniorlivingnews.com/sitemap.xml'],
+        'links': ['article h2 a::attr(href)', 'article h3 a::attr(href)'],
+        'next_page': ['a.next.page-numbers::attr(href)', 'a[rel="next"]::attr(href)'],
+        'fields': {
+            'title': ['h1.entry-title::text'],
+            'author': ['.author a::text'],
+            'publication_date': ['time.entry-date::attr(datetime)'],
+            'body': ['div.entry-content p ::text'],
+        },
+    },
+    'seniorshousingbusiness.com': {
+        'start_url': 'https://seniorshousingbusiness.com/',
+        'feeds': ['https://seniorshousingbusiness.com/feed/',
+                  'https://seniorshousingbusiness.com/sitemap.xml'],
+        'links': ['article h2 a::attr(href)', 'article h3 a::attr(href)'],
+        'next_page': ['a.next.page-numbers::attr(href)', 'a[rel="next"]::attr(href)'],
+        'fields': {
+            'title': ['h1.entry-title::text'],
+            'author': ['.author a::text'],
+            'publication_date': ['time.entry-date::attr(datetime)'],
+            'body': ['div.entry-content p ::text'],
+        },
+    },
+    'mcknightsseniorliving.com': {
+        'start_url': 'https://www.mcknightsseniorliving.com/',
+        'feeds': ['https://www.mcknightsseniorliving.com/feed/',
+                  'https://www.mcknightsseniorliving.com/sitemap.xml'],
+        'links': ['div.article-preview h2 a::attr(href)'],
+        'fields': {
+            'title': ['h1::text'],
+            'author': ['div.article-meta a::text'],
+            'publication_date': ['time::attr(datetime)'],
+            'body': ['div.article-content p ::text'],
+        },
+        'fast': True,
+    },
+    'argentum.org': {
+        'start_url': 'https://www.argentum.org/argentummedia/argentum-e-newsletter/',
+        'feeds': ['https://www.argentum.org/feed/',
+                  'https://www.argentum.org/sitemap.xml'],
+        'links': ['article h2 a::attr(href)', 'article h3 a::attr(href)',
+                  'div.entry-content a[href*="/argentummedia/"]::attr(href)'],
+        'fields': {
+            'title': ['h1.entry-title::text'],
+            'publication_date': ['time.entry-date::attr(datetime)'],
+            'body': ['div.entry-content p ::text'],
+        },
+    },
+}
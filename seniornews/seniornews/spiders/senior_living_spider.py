@@ -1,54 +1,193 @@
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
 import scrapy
+from scrapy import signals
+from ..crawlstate import url_fingerprint
+from ..extraction import ExtractionEngine
+from ..feeds import parse_feed
 from ..items import SeniorNewsItem
+from ..sites import SITES
 
 class SeniorLivingNewsSpider(scrapy.Spider):
     name = "senior_living_news"
-    allowed_domains = ["seniorhousingnews.com", "seniorlivingnews.com", 
-                      "seniorshousingbusiness.com", "mcknightsseniorliving.com", 
-                      "argentum.org"]
-    start_urls = [
-        'https://www.seniorhousingnews.com/',
-        'https://www.seniorlivingnews.com/',
-        'https://seniorshousingbusiness.com/',
-        'https://www.mcknightsseniorliving.com/',
-        'https://www.argentum.org/argentummedia/argentum-e-newsletter/'
-    ]
+    # Sites, their feeds and extraction rules live in sites.py
+    allowed_domains = list(SITES)
+    start_urls = [site['start_url'] for site in SITES.values()]
+
+    # Sitemaps and RSS/Atom feeds tried in order for feed-driven discovery.
+    # Sites whose feeds are missing or empty fall back to crawling their HTML.
+    feed_urls = {domain: site.get('feeds', []) for domain, site in SITES.items()}
+
+    # Set by CrawlStateMiddleware when incremental crawling is enabled.
+    crawl_state = None
+
+    def __init__(self, discovery='feeds', since=None, domains=None, shards=None,
+                 *args, **kwargs):
+        """
+        Args:
+            discovery: 'feeds' to discover articles from sitemaps and feeds,
+                or 'html' to crawl listing pages only
+            since: Only schedule feed entries published on or after this
+                ISO date (default: 7 days ago)
+            domains: Comma-separated sites to crawl (default: all of them)
+            shards: Comma-separated 'domain:i/n' entries; for those sites only
+                articles whose URL hash modulo n is i are followed, so n
+                processes can split one site (see crawl_sharded.py)
+        """
+        super().__init__(*args, **kwargs)
+        self.discovery = discovery
+        if since:
+            self.since = datetime.fromisoformat(since).replace(tzinfo=timezone.utc)
+        else:
+            self.since = datetime.now(timezone.utc) - timedelta(days=7)
+        if domains:
+            self.start_urls = [SITES[domain]['start_url'] for domain in domains.split(',')]
+        self.shards = {}
+        for shard in (shards.split(',') if shards else []):
+            domain, _, part = shard.rpartition(':')
+            index, count = part.split('/')
+            self.shards[domain] = (int(index), int(count))
+        self.extractor = ExtractionEngine(SITES)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Stats are only available once the crawl has started
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        return spider
+
+    def spider_opened(self, spider):
+        self.extractor.stats = self.crawler.stats
+
+    def closed(self, reason):
+        self.extractor.log_summary()
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        for url in self.start_urls:
+            feeds = self.site_feeds(url) if self.discovery == 'feeds' else []
+            if feeds:
+                yield self.feed_request(url, feeds)
+            else:
+                yield scrapy.Request(url, self.parse, dont_filter=True)
+
+    def site_feeds(self, url):
+        host = urlparse(url).hostname or ''
+        for domain, feeds in self.feed_urls.items():
+            if host == domain or host.endswith('.' + domain):
+                return list(feeds)
+        return []
+
+    def feed_request(self, site_url, feeds):
+        """Request the first of a site's feeds, remembering the rest to fall back on."""
+        return scrapy.Request(feeds[0], self.parse_feed, errback=self.feed_failed,
+                              dont_filter=True,
+                              meta={'site_url': site_url, 'feeds': feeds[1:]})
+
+    def next_discovery(self, meta):
+        """Try the site's next feed, or crawl its HTML once none are left."""
+        if meta['feeds']:
+            return self.feed_request(meta['site_url'], meta['feeds'])
+        self.crawler.stats.inc_value('discovery/html_fallback')
+        return scrapy.Request(meta['site_url'], self.parse, dont_filter=True)
+
+    def feed_failed(self, failure):
+        self.logger.info('Feed %s unavailable: %s', failure.request.url, failure.value)
+        if not failure.request.meta.get('child_sitemap'):
+            yield self.next_discovery(failure.request.meta)
+
+    def parse_feed(self, response):
+        # Unchanged since the last crawl, so it lists nothing new
+        if response.meta.get('crawlstate_unchanged'):
+            return
+
+        entries, sitemaps = parse_feed(response.body)
+        undated = entries and not any(date for _, date in entries)
+        if (not entries and not sitemaps) or undated:
+            # Not a usable feed; dates are needed to filter by the cutoff
+            if not response.meta.get('child_sitemap'):
+                yield self.next_discovery(response.meta)
+            return
+
+        # Sitemap index: only descend into sitemaps modified since the cutoff
+        for url, lastmod in sitemaps:
+            if lastmod is None or lastmod >= self.since:
+                yield response.follow(url, self.parse_feed, errback=self.feed_failed,
+                                      meta={'site_url': response.meta['site_url'],
+                                            'feeds': response.meta['feeds'],
+                                            'child_sitemap': True})
+
+        recent = {response.urljoin(url): date for url, date in entries
+                  if date and date >= self.since}
+        self.crawler.stats.inc_value('discovery/feed_entries', len(entries))
+        self.crawler.stats.inc_value('discovery/feed_recent', len(recent))
+        for request in self.follow_articles(response, list(recent)):
+            # Fallback for articles whose pages carry no machine-readable date
+            if request.url in recent:
+                request.meta['feed_published'] = recent[request.url].isoformat()
+            yield request
 
     def parse(self, response):
-        # Extract links to articles from Senior Housing News
-        if 'seniorhousingnews.com' in response.url:
-            for article in response.css('article.post'):
-                link = article.css('h2.entry-title a::attr(href)').get()
-                if link:
-                    yield response.follow(link, self.parse_article)
-
-            # Follow pagination if available
-            next_page = response.css('a.next.page-numbers::attr(href)').get()
-            if next_page:
-                yield response.follow(next_page, self.parse)
-        
-        # Add more website-specific parsing rules here
-        elif 'mcknightsseniorliving.com' in response.url:
-            for article in response.css('div.article-preview'):
-                link = article.css('h2 a::attr(href)').get()
-                if link:
-                    yield response.follow(link, self.parse_article)
+        # A listing page that has not changed since the last crawl holds no new articles
+        if response.meta.get('crawlstate_unchanged'):
+            return
+
+        rules = self.extractor.rules_for(response.url)
+        if rules is None:
+            return
+        links, next_page = self.extractor.extract_links(response, rules)
+        yield from self.follow_articles(response, links, next_page)
+
+    def follow_articles(self, response, links, next_page=None):
+        """Schedule article links, skipping recently crawled ones, and paginate.
+
+        Pagination stops once a listing page holds only articles seen on
+        earlier crawls, since older pages will not contain anything new.
+        """
+        urls = [response.urljoin(link) for link in links if link]
+        if self.shards:
+            urls = [url for url in urls if self.in_shard(url)]
+        for url in urls:
+            if self.crawl_state is not None and self.crawl_state.is_fresh(url):
+                self.crawler.stats.inc_value('crawlstate/skipped_fresh')
+                continue
+            yield response.follow(url, self.parse_article)
+
+        # Follow pagination if available
+        if next_page:
+            if (self.crawl_state is not None and urls
+                    and all(self.crawl_state.is_known(url) for url in urls)):
+                self.logger.info('Stopping pagination at %s: no new articles', response.url)
+                return
+            yield response.follow(next_page, self.parse)
+
+    def in_shard(self, url):
+        """True unless the URL's site is split and the URL is another worker's."""
+        rules = self.extractor.rules_for(url)
+        shard = rules and self.shards.get(rules.domain)
+        if not shard:
+            return True
+        index, count = shard
+        return int(url_fingerprint(url), 16) % count == index
 
     def parse_article(self, response):
-        item = SeniorNewsItem()
-        
-        # Senior Housing News
-        if 'seniorhousingnews.com' in response.url:
-            item['title'] = response.css('h1.entry-title::text').get()
-            item['author'] = response.css('span.author a::text').get()
-            item['publication_date'] = response.css('time.entry-date::attr(datetime)').get()
-            item['url'] = response.url
-        
-        # McKnight's Senior Living
-        elif 'mcknightsseniorliving.com' in response.url:
-            item['title'] = response.css('h1::text').get()
-            item['author'] = response.css('div.article-meta a::text').get()
-            item['publication_date'] = response.css('time::attr(datetime)').get()
-            item['url'] = response.url
-        
+        # Already extracted on an earlier crawl and unchanged since
+        if response.meta.get('crawlstate_unchanged'):
+            return
+
+        rules = self.extractor.rules_for(response.url)
+        if rules is None:
+            return
+
+        item = SeniorNewsItem(url=response.url)
+        fields = [field for field in item.fields if field != 'url']
+        item.update(self.extractor.extract(response, rules, fields))
+
+        if not item.get('publication_date'):
+            item['publication_date'] = response.meta.get('feed_published')
+
         yield item
@@ -0,0 +1,135 @@
+# Per-domain adaptive throttling.
+#
+# Replaces the global DOWNLOAD_DELAY + AutoThrottle pair, where the slowest
+# publisher set the pace for every site, with a crawl profile per domain. Each
+# profile has its own concurrency, delay floor and latency target, and its
+# download slot is tuned from that domain's observed response times only, so
+# all sites are crawled in parallel at their own pace.
+#
+# See https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class DomainThrottle:
+    """Extension that tunes each domain's download slot from its own latency.
+
+    The delay follows AutoThrottle's rule, latency divided by the wanted
+    concurrency, but never drops below the profile's floor. The concurrency
+    itself shrinks while the domain's smoothed latency is above its target
+    and grows back to the profile's limit when it recovers.
+    """
+
+    def __init__(self, crawler, profiles, default, smoothing, debug):
+        self.crawler = crawler
+        self.profiles = profiles
+        self.default = default
+        self.smoothing = smoothing
+        self.debug = debug
+        self.latency = {}
+        self.concurrency = {}
+        self.slot_profiles = {}
+        self.slots = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("DOMAIN_THROTTLE_ENABLED"):
+            raise NotConfigured
+        # Profile fields are documented with CRAWL_PROFILES in settings.py
+        default = settings.getdict("CRAWL_PROFILE_DEFAULT")
+        profiles = {
+            domain: dict(default, **profile)
+            for domain, profile in settings.getdict("CRAWL_PROFILES").items()
+        }
+        # A domain crawled by several processes at once gets a share of its
+        # profile in each, so together they stay within the profile's limits.
+        for domain, shares in settings.getdict("DOMAIN_THROTTLE_SHARES").items():
+            shares = int(shares)
+            profile = dict(profiles.get(domain, default))
+            profile["concurrency"] = max(1, profile["concurrency"] // shares)
+            profile["min_delay"] *= shares
+            profiles[domain] = profile
+        ext = cls(crawler, profiles, default,
+                  settings.getfloat("DOMAIN_THROTTLE_SMOOTHING", 0.3),
+                  settings.getbool("DOMAIN_THROTTLE_DEBUG"))
+        crawler.signals.connect(ext.request_reached_downloader,
+                                signal=signals.request_reached_downloader)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        return ext
+
+    def profile_for(self, host):
+        """Finds the profile for a host or any of its parent domains."""
+        labels = host.split(".")
+        for i in range(len(labels)):
+            profile = self.profiles.get(".".join(labels[i:]))
+            if profile is not None:
+                return profile
+        return self.default
+
+    def _slot(self, request):
+        key = request.meta.get("download_slot")
+        if key is None:
+            return None, None
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def request_reached_downloader(self, request, spider):
+        key, slot = self._slot(request)
+        # Idle slots are garbage collected by the downloader, so a new slot
+        # object can appear for a key that was already tuned.
+        if slot is None or self.slots.get(key) is slot:
+            return
+        self.slots[key] = slot
+        if key not in self.slot_profiles:
+            profile = self.slot_profiles[key] = self.profile_for(key)
+            self.concurrency[key] = profile["concurrency"]
+        profile = self.slot_profiles[key]
+        slot.concurrency = self.concurrency[key]
+        slot.delay = max(profile["min_delay"],
+                         self.latency.get(key, 0) / self.concurrency[key])
+
+    def response_downloaded(self, response, request, spider):
+        key, slot = self._slot(request)
+        latency = request.meta.get("download_latency")
+        if slot is None or latency is None or key not in self.slot_profiles:
+            return
+        profile = self.slot_profiles[key]
+
+        smoothed = self.latency.get(key, latency)
+        smoothed += self.smoothing * (latency - smoothed)
+        self.latency[key] = smoothed
+
+        # Error pages tend to be fast, so only let successful responses speed us up
+        concurrency = self.concurrency[key]
+        if smoothed > profile["target_latency"]:
+            concurrency = max(1, concurrency - 1)
+        elif response.status == 200:
+            concurrency = min(profile["concurrency"], concurrency + 1)
+        self.concurrency[key] = concurrency
+
+        delay = smoothed / concurrency
+        if response.status != 200:
+            delay = max(delay, slot.delay)
+        old_delay = slot.delay
+        slot.delay = min(max(profile["min_delay"], delay), profile["max_delay"])
+        slot.concurrency = concurrency
+
+        if self.debug:
+            logger.info(
+                "slot: %(slot)s | conc:%(concurrency)2d | delay:%(delay)5d ms (%(diff)+d) | "
+                "latency:%(latency)5d ms | smoothed:%(smoothed)5d ms",
+                {
+                    "slot": key,
+                    "concurrency": concurrency,
+                    "delay": slot.delay * 1000,
+                    "diff": (slot.delay - old_delay) * 1000,
+                    "latency": latency * 1000,
+                    "smoothed": smoothed * 1000,
+                },
+                extra={"spider": spider},
+            )
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from seniornews.neardup import FeaturedIndex, MinHasher, distinct
+
+# Coverage of one story by different publishers
+REWRITTEN = [
+    ('Brookdale Senior Living reports third-quarter occupancy gains',
+     'Brookdale reports Q3 occupancy gains'),
+    ('Welltower to acquire 85 senior housing communities for $1.6 billion',
+     'Welltower acquires 85 senior housing properties in $1.6 billion deal'),
+    ('Argentum urges Congress to address senior living workforce shortage',
+     'Congress urged by Argentum to address workforce shortage in senior living'),
+]
+
+# Different stories in the same words of the trade
+UNRELATED = [
+    ('Senior living REITs outperform the market in Q3',
+     'Senior living construction starts slow in Q3'),
+    ('Senior living occupancy rises in Q3',
+     'Senior living rents climb again in Q3'),
+    ('Brookdale reports Q3 occupancy gains',
+     'Senior living construction starts slow in Q3'),
+]
+
+
+def story(title, n):
+    return {'url': f'https://example.com/{n}', 'title': title}
+
+
+class DistinctTest(unittest.TestCase):
+    def test_rewritten_headlines_take_one_slot(self):
+        for first, second in REWRITTEN:
+            with self.subTest(first=first):
+                picked = distinct([(2, story(first, 1)), (1, story(second, 2))], 5)
+                self.assertEqual([article['title'] for _, article in picked], [first])
+
+    def test_unrelated_headlines_are_kept(self):
+        for first, second in UNRELATED:
+            with self.subTest(first=first):
+                picked = distinct([(2, story(first, 1)), (1, story(second, 2))], 5)
+                self.assertEqual(len(picked), 2)
+
+    def test_headline_of_stop_words_is_not_a_duplicate(self):
+        picked = distinct([(2, story('Senior living', 1)), (1, story('Senior living', 2))], 5)
+        self.assertEqual(len(picked), 2)
+
+
+class FeaturedIndexTest(unittest.TestCase):
+    def test_rewrite_of_a_featured_story_is_recognised_after_reload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'featured.json')
+            index = FeaturedIndex(path, MinHasher())
+            index.feature(story(REWRITTEN[0][0], 1))
+            index.save()
+            reloaded = FeaturedIndex(path, MinHasher())
+            self.assertTrue(reloaded.contains(story(REWRITTEN[0][1], 2)))
+            self.assertFalse(reloaded.contains(story(UNRELATED[0][0], 3)))
+
+    def test_index_in_an_older_format_keeps_its_stories(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'featured.json')
+            with open(path, 'w') as f:
+                json.dump({'version': 1, 'num_perm': 64, 'stories': [{
+                    'url': 'https://example.com/1', 'title': REWRITTEN[0][0],
+                    'featured_at': datetime.now(timezone.utc).isoformat(),
+                    'signatures': {'title': [0] * 64}}]}, f)
+            index = FeaturedIndex(path, MinHasher())
+            self.assertTrue(index.contains(story(REWRITTEN[0][1], 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
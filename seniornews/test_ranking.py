@@ -0,0 +1,104 @@
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from seniornews.feeds import parse_date
+from seniornews import ranking
+from seniornews.ranking import HashingScorer, parse_dates
+
+MIXED_DATES = [
+    '2024-03-05',
+    '2024-03-05T10:15:30',
+    '2024-03-05 10:15:30',
+    '2024-03-05T10:15:30Z',
+    '2024-03-05T10:15:30+00:00',
+    '2024-03-05T10:15:30+05:30',
+    '2024-03-05T10:15:30-05:00',
+    '2024-03-05T10:15:30+0530',
+    '2024-03-05T10:15:30-0500',
+    '2024-03-05T10:15:30.250Z',
+    '2024-03-05T10:15:30.250-05:00',
+    ' 2024-03-05T10:15:30+01:00 ',
+    'Tue, 05 Mar 2024 10:15:30 +0000',
+    'Tue, 05 Mar 2024 10:15:30 -0500',
+    'Tue, 05 Mar 2024 10:15:30 GMT',
+    'not a date',
+    '',
+    None,
+]
+
+
+class ParseDatesTest(unittest.TestCase):
+    def assertAgreesWithParseDate(self, values):
+        for value, seconds in zip(values, parse_dates(values)):
+            date = parse_date(value)
+            with self.subTest(value=value):
+                if date is None:
+                    self.assertTrue(math.isnan(seconds))
+                else:
+                    self.assertEqual(seconds, date.timestamp())
+
+    def test_mixed_batch_agrees_with_parse_date(self):
+        self.assertAgreesWithParseDate(MIXED_DATES)
+
+    def test_each_value_alone_agrees_with_parse_date(self):
+        for value in MIXED_DATES:
+            self.assertAgreesWithParseDate([value])
+
+    def test_invalid_iso_date_does_not_spoil_the_batch(self):
+        self.assertAgreesWithParseDate(['2024-13-05T10:15:30Z', '2024-03-05T10:15:30-0500'])
+
+
+ARTICLES = [
+    {'url': 'https://example.com/a', 'title': 'Senior living occupancy rises',
+     'body': 'Assisted living communities report higher occupancy this quarter.'},
+    {'url': 'https://example.com/b', 'title': 'Local team wins the cup', 'body': 'Football.'},
+]
+
+
+class HashingScorerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'scores.json')
+        self.scored = []
+        score = ranking._hash_similarities
+
+        def counting(texts, reference_text, n_features):
+            self.scored.extend(texts)
+            return score(texts, reference_text, n_features)
+
+        patch = mock.patch.object(ranking, '_hash_similarities', counting)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_articles_are_not_scored_again(self):
+        scorer = HashingScorer('senior living occupancy', workers=1)
+        first = scorer.similarities(ARTICLES)
+        self.assertEqual(list(scorer.similarities(ARTICLES)), list(first))
+        self.assertEqual(len(self.scored), 2)
+
+    def test_changed_body_is_scored_again(self):
+        scorer = HashingScorer('senior living occupancy', workers=1)
+        scorer.similarities(ARTICLES)
+        changed = dict(ARTICLES[1], body='Senior living occupancy rises.')
+        scores = scorer.similarities([ARTICLES[0], changed])
+        self.assertEqual(len(self.scored), 3)
+        self.assertGreater(scores[1], 0)
+
+    def test_scores_persist_for_the_same_reference(self):
+        scorer = HashingScorer('senior living occupancy', self.path, workers=1)
+        scorer.similarities(ARTICLES)
+        scorer.save()
+        HashingScorer('senior living occupancy', self.path, workers=1).similarities(ARTICLES)
+        self.assertEqual(len(self.scored), 2)
+        HashingScorer('memory care staffing', self.path, workers=1).similarities(ARTICLES)
+        self.assertEqual(len(self.scored), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()